@@ -1,6 +1,20 @@
+import os
 import re
-import google.generativeai as genai
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from .cache import LRUCache, normalize_text
 from .intent_agent import IntentAgent
+from .llm_client import LLMClient
+from .session_store import create_session_store
+from .tracing import tracer
+
+# Lookups each intent's branch can use; speculative work for any other is cancelled
+BRANCH_LOOKUPS = {
+    "TECHNICAL_DRILL": {"tech_category", "tech_search"},
+    "FUNDAMENTAL_INFO": {"shot_detect", "fundamental_detect"},
+    "SHOT_INFO": {"shot_detect", "fundamental_detect"},
+    "GENERAL_KNOWLEDGE": {"rag_search"}
+}
 
 
 class ConversationRouter:
@@ -14,35 +28,153 @@ class ConversationRouter:
         
         # 🧠 ADDED: The AI Brain
         self.intent_agent = IntentAgent()
-        self.chat_model = genai.GenerativeModel('gemini-3-flash-preview')
+        # Summaries get a longer deadline but trip the same breaker as intent calls
+        self.summary_llm = LLMClient(
+            self.intent_agent.model,
+            deadline=float(os.getenv("LLM_SUMMARY_DEADLINE_SECONDS", "15")),
+            hedge_after=self.intent_agent.llm.hedge_after,
+            max_attempts=self.intent_agent.llm.max_attempts,
+            breaker=self.intent_agent.breaker,
+            pool_size=self.intent_agent.llm.pool_size
+        )
         self.rag = None
-        self.sessions = {}  
+        # How long a GENERAL_KNOWLEDGE question waits for a library that is still loading
+        self.rag_wait_seconds = float(os.getenv("RAG_WAIT_SECONDS", "2"))
+        # Summaries of GENERAL_KNOWLEDGE answers, keyed on subject + retrieved chunks
+        self.answer_cache = LRUCache(
+            max_entries=int(os.getenv("ANSWER_CACHE_SIZE", "512")),
+            ttl=float(os.getenv("ANSWER_CACHE_TTL", "86400"))
+        )
+        self._answer_cache_generation = None
+        # Bounded per-user memory (LRU + idle TTL); SESSION_BACKEND=sqlite shares it across workers
+        self.sessions = create_session_store()
+        # While Gemini classifies, run the cheap local lookups for the likely subject
+        # on a pool and let the chosen branch reuse them (ROUTER_SPECULATIVE=0 = off)
+        self.speculative = os.getenv("ROUTER_SPECULATIVE", "1") != "0"
+        self.speculation_pool = ThreadPoolExecutor(
+            max_workers=int(os.getenv("ROUTER_SPECULATIVE_WORKERS", "8")),
+            thread_name_prefix="speculate"
+        ) if self.speculative else None
+        # At most this many lookups queued per request, so one message cannot flood the pool
+        self.speculation_max = int(os.getenv("ROUTER_SPECULATIVE_MAX", "6"))
+        self.speculation = {"requests": 0, "launched": 0, "used": 0, "inline": 0, "cancelled": 0}
+        self._speculation_lock = threading.Lock()
 
     def process(self, user_id, user, text):
-        msg = text.strip()
+        """Runs a message to completion and returns the response dict."""
+        with tracer.span("session_load"):
+            memory = self.sessions.get(user_id)
+        route = self._route(memory, user, text, stream=False)
+        while True:
+            try:
+                next(route)
+            except StopIteration as done:
+                with tracer.span("session_save"):
+                    self.sessions.save(memory)
+                return done.value
 
-        # ==========================
-        # 1. INIT MEMORY (Kept Exact)
-        # ==========================
-        if user_id not in self.sessions:
-            self.sessions[user_id] = {
-                "last_area": None,
-                "tech_last_category": None,
-                "tech_last_area": None,
-                "tech_drill_index": 0
-            }
-        memory = self.sessions[user_id]
+    def process_stream(self, user_id, user, text):
+        """
+        Yields (event, payload) pairs as the answer is produced:
+        "intent" once the message is classified, "sources" / "token" while a
+        GENERAL_KNOWLEDGE summary streams, then "done" with the same dict
+        process() would have returned.
+        """
+        with tracer.span("session_load"):
+            memory = self.sessions.get(user_id)
+        response = yield from self._route(memory, user, text, stream=True)
+        with tracer.span("session_save"):
+            self.sessions.save(memory)
+        yield "done", response
+
+    def _summarise(self, prompt, stream):
+        """Yields the summary text, token chunks at a time when streaming."""
+        if not stream:
+            yield self.summary_llm.generate_content(prompt).text
+            return
+        for chunk in self.summary_llm.generate_content(prompt, stream=True):
+            if chunk.text:
+                yield chunk.text
+
+    def _speculate(self, msg, spec):
+        """
+        Queues the cheap local lookups for the guessed subject (then the raw
+        message) into spec, up to speculation_max. A full RAG search is only
+        speculated when the local classifier leans towards GENERAL_KNOWLEDGE.
+        """
+        lookups = [
+            ("tech_category", self.tech.find_category_from_query),
+            ("tech_search", self.tech.search_area_by_query),
+            ("shot_detect", self.inference._detect_shot),
+            ("fundamental_detect", self.inference._detect_fundamental)
+        ]
+        if self.rag and self.rag.ready.is_set() and self.intent_agent.guess_intent(msg) == "GENERAL_KNOWLEDGE":
+            lookups.insert(0, ("rag_search", self.rag.search))
+
+        subject = self.intent_agent.guess_subject(msg)
+        texts = [subject] if subject == msg else [subject, msg]
+        for text in texts:
+            for name, fn in lookups:
+                if len(spec) >= self.speculation_max:
+                    break
+                spec[(name, text)] = self.speculation_pool.submit(fn, text)
+        with self._speculation_lock:
+            self.speculation["requests"] += 1
+            self.speculation["launched"] += len(spec)
+
+    def _cancel(self, spec, keep=()):
+        """Cancels (and forgets) every speculative lookup not in keep that has not started yet."""
+        cancelled = 0
+        for key in [k for k in spec if k not in keep]:
+            if spec.pop(key).cancel():
+                cancelled += 1
+        if cancelled:
+            with self._speculation_lock:
+                self.speculation["cancelled"] += cancelled
+
+    def _lookup(self, spec, name, fn, text):
+        """fn(text), or the speculative result if one was started for exactly this text."""
+        future = spec.pop((name, text), None)
+        if future is None:
+            return fn(text)
+        if future.cancel():
+            # still queued behind other requests' speculation: running it here is faster
+            with self._speculation_lock:
+                self.speculation["inline"] += 1
+            return fn(text)
+        with self._speculation_lock:
+            self.speculation["used"] += 1
+        return future.result()
+
+    def speculation_stats(self):
+        with self._speculation_lock:
+            stats = dict(self.speculation)
+        stats["enabled"] = self.speculative
+        stats["hit_rate"] = round(stats["used"] / stats["launched"], 4) if stats["launched"] else None
+        return stats
+
+    def _route(self, memory, user, text, stream):
+        # Generator: intermediate events are yielded, the final response is returned
+        # 'memory' is the user's Session; the caller saves it afterwards
+        spec = {}   # (lookup name, text) -> speculative Future
+        try:
+            return (yield from self._route_message(memory, user, text, stream, spec))
+        finally:
+            self._cancel(spec)
+
+    def _route_message(self, memory, user, text, stream, spec):
+        msg = text.strip()
 
         # ============================================================
         # 2. HANDLE "MORE" & CODES (Kept Exact - Fast Path)
         # ============================================================
         
         # Check for "more"
-        if msg.lower() == "more" and memory["tech_last_area"]:
-            result = self.tech.get_area_drills(memory["tech_last_area"], start=memory["tech_drill_index"], count=2)
-            memory["tech_drill_index"] += 2
+        if msg.lower() == "more" and memory.tech_last_area:
+            result = self.tech.get_area_drills(memory.tech_last_area, start=memory.tech_drill_index, count=2)
+            memory.tech_drill_index += 2
             return {
-                "chat": f"More drills for {memory['tech_last_area']} 👇",
+                "chat": f"More drills for {memory.tech_last_area} 👇",
                 "technical_drills": {
                     "returned": result["returned"],
                     "remaining": result["remaining"]
@@ -54,8 +186,8 @@ class ConversationRouter:
         if match:
             area_id = match.group(1).upper()
             result = self.tech.get_area_drills(area_id, start=0, count=2)
-            memory["tech_last_area"] = area_id
-            memory["tech_drill_index"] = 2
+            memory.tech_last_area = area_id
+            memory.tech_drill_index = 2
             return {
                 "chat": f"Sure! Here are the drills for {area_id}.",
                 "technical_drills": {
@@ -69,8 +201,8 @@ class ConversationRouter:
             category = self.tech.get_category_by_id(msg.upper())
             if category:
                 subareas = self.tech.get_sub_areas(category["category_name"])
-                memory["tech_last_category"] = category["category_id"]
-                memory["tech_last_area"] = None
+                memory.tech_last_category = category["category_id"]
+                memory.tech_last_area = None
                 return {
                     "type": "technical_category",
                     "category_id": category["category_id"],
@@ -83,12 +215,19 @@ class ConversationRouter:
         # 3. ASK THE AI BRAIN (This replaces the SPLIT_KEYS loop)
         # ============================================================
         # The AI fixes typos ("powet" -> "power") and tells us the INTENT.
-        ai_data = self.intent_agent.classify_intent(msg)
+        with tracer.span("intent"):
+            ai_data = self.intent_agent.classify_fast(msg)
+            if ai_data is None:
+                # Gemini round trip ahead: overlap it with the local lookups
+                if self.speculative:
+                    self._speculate(msg, spec)
+                ai_data = self.intent_agent.classify_llm(msg)
         intent = ai_data.get("intent", "UNKNOWN")
         
         # 'part' is now the Cleaned Subject from AI (e.g. "power hitting")
         part = ai_data.get("subject", msg) 
         if not part: part = msg # Safety fallback
+        yield "intent", {"intent": intent, "subject": part}
 
         rag_keywords = [
             "rule", "law", "umpire", "signal", "run", "boundary", "catch", "out", 
@@ -100,10 +239,16 @@ class ConversationRouter:
         if intent == "UNKNOWN" or intent == "TECHNICAL_DRILL":
              if any(k in msg.lower() for k in rag_keywords):
                  # Only force if it's NOT a drill found by tech engine
-                 if not self.tech.search_area_by_query(part):
+                 with tracer.span("tech_search"):
+                     area = self._lookup(spec, "tech_search", self.tech.search_area_by_query, part)
+                 if not area:
                      print(f"⚠️ Forcing RAG lookup for: {msg}")
                      intent = "GENERAL_KNOWLEDGE"
 
+        # Branch is known: drop queued lookups it can never use
+        if spec:
+            self._cancel(spec, keep={(name, part) for name in BRANCH_LOOKUPS.get(intent, ())})
+
 
 
 
@@ -115,8 +260,9 @@ class ConversationRouter:
 
         # --- CASE: EXERCISES ---
         if intent == "EXERCISE":
-            result = self.exercise.get_batting_exercises(user, part)
-            memory["last_exercise_goal"] = part.upper()
+            with tracer.span("exercise"):
+                result = self.exercise.get_batting_exercises(user, part)
+            memory.last_exercise_goal = part.upper()
             ordered_output.append({
                 "type": "exercise",
                 "input": part,
@@ -128,11 +274,12 @@ class ConversationRouter:
         if intent == "TECHNICAL_DRILL":
             
             # A. CATEGORY REQUEST (Moved here from your original code)
-            cat = self.tech.find_category_from_query(part)
+            with tracer.span("tech_category"):
+                cat = self._lookup(spec, "tech_category", self.tech.find_category_from_query, part)
             if cat:
                 sub_list = self.tech.get_sub_areas(cat["category_name"])
-                memory["tech_last_category"] = cat["category_id"]
-                memory["tech_last_area"] = None
+                memory.tech_last_category = cat["category_id"]
+                memory.tech_last_area = None
                 
                 ordered_output.append({
                     "type": "technical_category",
@@ -143,7 +290,8 @@ class ConversationRouter:
                 return {"chat": f"I found the **{cat['category_name']}** category.", "ordered_responses": ordered_output}
 
             # B. DIRECT TECHNIQUE (Moved here from your original code)
-            area = self.tech.search_area_by_query(part)
+            with tracer.span("tech_search"):
+                area = self._lookup(spec, "tech_search", self.tech.search_area_by_query, part)
             if area:
                 ordered_output.append({
                     "type": "technical_direct",
@@ -152,7 +300,8 @@ class ConversationRouter:
                 return {"chat": f"Specific drills for **{area['name']}**:", "ordered_responses": ordered_output}
             
             # C. ROLE BASED FALLBACK (Moved here from your original code)
-            mapping = self.tech.recommend_technical_areas(user)
+            with tracer.span("tech_roadmap"):
+                mapping = self.tech.recommend_technical_areas(user)
             if mapping["structured"]:
                 ordered_output.append({
                     "type": "batting_role_priority",
@@ -166,14 +315,16 @@ class ConversationRouter:
         # --- CASE: FUNDAMENTALS / SHOTS ---
         if intent in ["FUNDAMENTAL_INFO", "SHOT_INFO"]:
             # Try Shot detection first
-            shot_key = self.inference._detect_shot(part)
+            with tracer.span("shot_detect"):
+                shot_key = self._lookup(spec, "shot_detect", self.inference._detect_shot, part)
             if shot_key:
-                data = self.inference.process_query(part)
+                with tracer.span("inference"):
+                    data = self.inference.process_query(part)
                 ordered_output.append({ "type": "shot", "input": part, "result": data })
                 return {"chat": "Here is the shot analysis:", "ordered_responses": ordered_output}
             
             # Try Fundamental detection
-            fund = self.inference._detect_fundamental(part)
+            fund = self._lookup(spec, "fundamental_detect", self.inference._detect_fundamental, part)
             if fund:
                 ordered_output.append({
                     "type": "fundamental",
@@ -182,7 +333,8 @@ class ConversationRouter:
                 return {"chat": "Here is the fundamental info:", "ordered_responses": ordered_output}
             
             # Fallback for general questions
-            data = self.inference.process_query(part)
+            with tracer.span("inference"):
+                data = self.inference.process_query(part)
             ordered_output.append({ "type": "fundamental", "result": data })
             return {"chat": "Here is what I found:", "ordered_responses": ordered_output}
 
@@ -190,11 +342,30 @@ class ConversationRouter:
              
              # Check if RAG engine is connected
              if self.rag:
-                 # 1. Search the Library
-                 context = self.rag.search(part)
-                 
-                 if context:
-                     # 2. Ask Gemini to Summarize
+                 # 0. Library may still be indexing in the background
+                 with tracer.span("rag_wait"):
+                     ready = self.rag.wait_ready(self.rag_wait_seconds)
+                 if not ready:
+                     if self.rag.status()["state"] == "failed":
+                         return { "chat": "My library is currently offline. Please restart the system." }
+                     return { "chat": "📚 My cricket library is still warming up. Please ask again in a few seconds!" }
+
+                 # 1. Search the Library (top-k BM25 chunks)
+                 with tracer.span("rag_search"):
+                     results = self._lookup(spec, "rag_search", self.rag.search, part)
+
+                 if results:
+                     # 2. Same question over the same chunks -> reuse the summary
+                     if self.rag.generation != self._answer_cache_generation:
+                         self.answer_cache.clear()  # library reloaded
+                         self._answer_cache_generation = self.rag.generation
+                     cache_key = (normalize_text(part), tuple((r["source"], r["chunk_id"]) for r in results))
+                     cached = self.answer_cache.get(cache_key)
+                     if cached is not None:
+                         return { "chat": cached }
+
+                     context = self.rag.build_context(results)
+                     # 3. Ask Gemini to Summarize
                      prompt = f"""
                      You are an expert Cricket Coach. Answer the question using ONLY the context below.
                      
@@ -205,11 +376,21 @@ class ConversationRouter:
                      
                      Keep the answer short, professional, and helpful.
                      """
+                     yield "sources", {"sources": [{"source": r["source"], "chunk_id": r["chunk_id"]} for r in results]}
                      try:
-                         response = self.intent_agent.model.generate_content(prompt)
-                         return { "chat": response.text }
-                     except:
-                         return { "chat": "I found the info in the books, but I'm having trouble summarizing it right now."}
+                         pieces = []
+                         with tracer.span("summary"):
+                             for piece in self._summarise(prompt, stream):
+                                 pieces.append(piece)
+                                 yield "token", {"text": piece}
+                         answer = "".join(pieces)
+                         self.answer_cache.set(cache_key, answer)
+                         return { "chat": answer }
+                     except Exception as e:
+                         # Deadline / breaker / provider error: answer with the best passage verbatim
+                         print(f"[ERROR] Summary Failed: {e}")
+                         top = results[0]
+                         return { "chat": f"📘 From **{top['source']}**:\n\n{top['text'].strip()}" }
                  else:
                      return { "chat": "Please ask Something Related to Cricket" }
              else:
@@ -1,6 +1,8 @@
 import json
 import os
 
+from .vocab_matcher import get_matcher
+
 class ExerciseEngine:
 
     GOAL_MAP = {
@@ -85,6 +87,11 @@ class ExerciseEngine:
             if key in text:
                 return goal
 
+        # misspelt goal ("stamna", "powet hitting")
+        goal = get_matcher().lookup(text, "exercise_goal")
+        if goal:
+            return goal
+
         return "POWER_HITTING"  # safe default fallback
 
 
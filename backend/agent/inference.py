@@ -1,6 +1,8 @@
 import json
 import os
 
+from .vocab_matcher import get_matcher
+
 
 class CricketInferenceEngine:
     def __init__(self):
@@ -81,7 +83,12 @@ class CricketInferenceEngine:
         if info["name"].lower() in q:
             return shot_key
 
-    # 3️⃣ partial word match (pull, sweep, drive...)
+    # 3️⃣ misspelt shot name ("cover drve")
+     shot_key = get_matcher().lookup(q, "shot")
+     if shot_key:
+        return shot_key
+
+    # 4️⃣ partial word match (pull, sweep, drive...)
      for shot_key, info in self.shots_data.items():
 
         words = info["name"].lower().split()
@@ -99,7 +106,7 @@ class CricketInferenceEngine:
             for kw in info["keywords"]:
                 if kw in query:
                     return key
-        return None
+        return get_matcher().lookup(query, "fundamental")
     
     def _detect_roadmap(self, query: str):
         data = self.roadmap["roadmap_beginner"]
@@ -0,0 +1,150 @@
+"""
+Registration input validation compiled from rules/user_inputs.json.
+
+    from agent.input_validator import get_validator
+    ok, message = get_validator().validate(user_data)
+    results = get_validator().validate_many(records)    # [(ok, message), ...]
+    ok, message = get_validator().validate_changes(changes)   # partial update
+
+The rules are compiled once into per-field checks (int ranges, frozenset
+choices, non-empty strings). Both required_fields and optional_fields are enforced; an
+optional field may be missing or null. The rules file is re-read when its
+mtime changes, checked at most every RULES_RELOAD_SECONDS (0 = never).
+"""
+import json
+import os
+import threading
+import time
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RULES_PATH = os.path.join(BASE_DIR, "rules", "user_inputs.json")
+
+VALID = (True, "Valid Input")
+
+
+def _compile_field(field, rule):
+    """
+    (field, kind, a, b): "int" -> a..b range, "choice" -> a is a frozenset,
+    "string" -> non-empty str; unknown types only require presence.
+    """
+    kind = rule.get("type")
+    if kind == "int":
+        return field, "int", rule.get("min", float("-inf")), rule.get("max", float("inf"))
+    if kind == "choice":
+        return field, "choice", frozenset(rule["values"]), None
+    if kind == "string":
+        return field, "string", None, None
+    return field, "any", None, None
+
+
+class InputValidator:
+
+    def __init__(self, path=RULES_PATH, reload_seconds=None):
+        self.path = path
+        if reload_seconds is None:
+            reload_seconds = float(os.getenv("RULES_RELOAD_SECONDS", "2"))
+        self.reload_seconds = reload_seconds
+        self._lock = threading.Lock()
+        self._next_check = 0.0
+        self.reloads = 0
+        self._load()
+
+    def _load(self):
+        mtime = os.path.getmtime(self.path)
+        with open(self.path, "r", encoding="utf-8") as f:
+            rules = json.load(f)
+        required = tuple(_compile_field(f, r) for f, r in rules.get("required_fields", {}).items())
+        optional = tuple(_compile_field(f, r) for f, r in rules.get("optional_fields", {}).items())
+        # swapped in one assignment so concurrent validations never see half a rule set
+        self._compiled = (mtime, required, optional)
+
+    def _maybe_reload(self):
+        if not self.reload_seconds:
+            return
+        now = time.monotonic()
+        if now < self._next_check:
+            return
+        with self._lock:
+            if now < self._next_check:
+                return
+            self._next_check = now + self.reload_seconds
+            try:
+                if os.path.getmtime(self.path) != self._compiled[0]:
+                    self._load()
+                    self.reloads += 1
+                    print(f"[RULES] ✅ Reloaded {os.path.basename(self.path)}")
+            except (OSError, ValueError, KeyError) as e:
+                # keep validating with the last good rules
+                print(f"[RULES] ⚠️ Could not reload {self.path}: {e}")
+
+    @staticmethod
+    def _check(checks, record, optional):
+        for field, kind, a, b in checks:
+            val = record.get(field)
+            if val is None and (optional or field not in record):
+                continue
+            if kind == "int":
+                if type(val) is not int:
+                    return False, f"{field} must be an integer."
+                if val < a or val > b:
+                    return False, f"{field} outside valid range."
+            elif kind == "choice":
+                try:
+                    if val not in a:
+                        return False, f"{field} not in valid value list."
+                except TypeError:   # unhashable, e.g. a list
+                    return False, f"{field} not in valid value list."
+            elif kind == "string":
+                if not isinstance(val, str) or not val.strip():
+                    return False, f"{field} must be a non-empty string."
+        return None
+
+    def _validate(self, record, required, optional):
+        if not isinstance(record, dict):
+            return False, "Record must be an object."
+        # every missing field is reported before any bad value, as before
+        for field, _, _, _ in required:
+            if field not in record:
+                return False, f"Missing required field: {field}"
+        return self._check(required, record, False) or self._check(optional, record, True) or VALID
+
+    def int_fields(self):
+        """Names of the fields the rules type as int (required and optional)."""
+        _, required, optional = self._compiled
+        return frozenset(field for field, kind, _, _ in required + optional if kind == "int")
+
+    def validate(self, record):
+        """(ok, message) for one registration record."""
+        self._maybe_reload()
+        _, required, optional = self._compiled
+        return self._validate(record, required, optional)
+
+    def validate_changes(self, changes):
+        """(ok, message) for a partial update: only the fields present in changes are checked."""
+        self._maybe_reload()
+        _, required, optional = self._compiled
+        if not isinstance(changes, dict):
+            return False, "Record must be an object."
+        # a required field may be left out, but not cleared
+        present = tuple(check for check in required if check[0] in changes)
+        return self._check(present, changes, False) or self._check(optional, changes, True) or VALID
+
+    def validate_many(self, records):
+        """[(ok, message), ...] in input order; the rules are checked for changes once per call."""
+        self._maybe_reload()
+        _, required, optional = self._compiled
+        return [self._validate(record, required, optional) for record in records]
+
+
+_validator = None
+_validator_lock = threading.Lock()
+
+
+def get_validator():
+    """Process-wide InputValidator, compiled on first use."""
+    global _validator
+    if _validator is None:
+        with _validator_lock:
+            if _validator is None:
+                _validator = InputValidator()
+    return _validator
@@ -1,62 +1,249 @@
-import google.generativeai as genai
 import os
 import json
+import threading
+import time
 from dotenv import load_dotenv
+from .intent_batcher import IntentBatcher
+from .intent_cache import DEFAULT_PATH as INTENT_CACHE_PATH, IntentCache
+from .intent_classifier import LOG_PATH, LocalIntentClassifier
+from .llm_backend import create_model
+from .llm_client import CircuitBreaker, LLMClient
+from .vocab_matcher import get_matcher
 
 load_dotenv()
 
+SYSTEM_PROMPT = """
+You are the 'Brain' of a Cricket Coaching App. 
+Analyze the user's query and return a JSON object with:
+- "intent": One of [TECHNICAL_DRILL, EXERCISE, FUNDAMENTAL_INFO, SHOT_INFO, GENERAL_KNOWLEDGE, CODE_INPUT]
+- "subject": The specific cricket topic, corrected for typos.
+
+GUIDELINES:
+1. **TECHNICAL_DRILL**: User wants to improve/practice a skill (e.g., "batting", "bowling", "fielding", "footwork", "timing").
+2. **EXERCISE**: User wants fitness/gym work (e.g., "strength", "stamina", "warm up").
+3. **FUNDAMENTAL_INFO**: User asks "what is" or "how to hold" (Definitions).
+4. **GENERAL_KNOWLEDGE**: History, rules, or player facts.
+5. **CODE_INPUT**: Short codes like "A1", "B2" or "more".
+6. **SHOT_INFO**: User asks "how to play" or about a specific shot (e.g., "how to play cut shot", "cover drive technique", "pull shot").
+
+EXAMPLES:
+- "improve powet hitting" -> {"intent": "TECHNICAL_DRILL", "subject": "power hitting"}
+- "drils for foot wrk" -> {"intent": "TECHNICAL_DRILL", "subject": "footwork"}
+- "batting drills" -> {"intent": "TECHNICAL_DRILL", "subject": "batting"}
+- "fitness for batting" -> {"intent": "EXERCISE", "subject": "batting fitness"}
+- "who is sachin?" -> {"intent": "GENERAL_KNOWLEDGE", "subject": "Sachin Tendulkar"}
+- "A2" -> {"intent": "CODE_INPUT", "subject": "A2"}
+- "how to play cut shot" -> {"intent": "SHOT_INFO", "subject": "cut shot"}
+- "drills for cut shot" -> {"intent": "SHOT_INFO", "subject": "cut shot"}
+
+Return ONLY raw JSON.
+"""
+
+# Deterministic routing used when Gemini is slow, failing or switched off by the breaker.
+# First match wins, so the more specific intents come first.
+KEYWORD_ROUTES = [
+    ("SHOT_INFO", ["drive", "shot", "sweep", "pull", "cut", "glance", "defence", "defense", "punch", "lofted"]),
+    ("EXERCISE", ["gym", "fitness", "workout", "exercise", "strength", "stamina", "endurance", "warm up", "agility"]),
+    ("FUNDAMENTAL_INFO", ["grip", "hold", "stance", "backlift", "trigger", "beginner", "basics", "new to cricket"]),
+    ("GENERAL_KNOWLEDGE", ["rule", "law", "umpire", "lbw", "wide", "no ball", "history", "who is", "who won",
+                           "world cup", "trophy", "powerplay", "signal"]),
+    ("TECHNICAL_DRILL", ["drill", "practice", "improve", "batting", "bowling", "fielding", "footwork", "timing",
+                         "spin", "pace", "power", "running", "rotation", "pressure"])
+]
+
+
 class IntentAgent:
     def __init__(self):
-        api_key = os.getenv("GOOGLE_API_KEY")
-        if not api_key:
-            raise ValueError("No GOOGLE_API_KEY found in .env file")
-            
-        genai.configure(api_key=api_key)
-        
         # We use Gemini 2.5 Flash as confirmed by your test
-        self.model = genai.GenerativeModel(
-            model_name= 'gemini-3-flash-preview',
+        # LLM_BACKEND=replay serves a recorded cassette instead (no API key needed)
+        self.model = create_model(
+            'gemini-3-flash-preview',
             generation_config={"response_mime_type": "application/json"}
         )
 
+        # Every Gemini call gets a deadline; the breaker is shared with the router's summaries
+        self.breaker = CircuitBreaker(
+            failure_threshold=int(os.getenv("LLM_BREAKER_FAILURES", "5")),
+            reset_seconds=float(os.getenv("LLM_BREAKER_RESET_SECONDS", "30"))
+        )
+        self.llm = LLMClient(
+            self.model,
+            deadline=float(os.getenv("LLM_INTENT_DEADLINE_SECONDS", "4")),
+            hedge_after=float(os.getenv("LLM_HEDGE_AFTER_SECONDS", "0")) or None,
+            max_attempts=int(os.getenv("LLM_MAX_ATTEMPTS", "2")),
+            breaker=self.breaker,
+            # at least the server's worker threads, or bursts queue behind the pool
+            pool_size=int(os.getenv("LLM_POOL_SIZE", "32"))
+        )
+
+        # Local fast path: answer without Gemini when the classifier is confident enough
+        self.local_threshold = float(os.getenv("INTENT_LOCAL_THRESHOLD", "0.75"))
+        # Training log, opt-in (INTENT_LOG=1): every LLM classification is appended to
+        # data/intent_log.jsonl WITH THE RAW USER MESSAGE. It rotates to intent_log.jsonl.1
+        # once it reaches INTENT_LOG_MAX_BYTES, so at most two files are kept.
+        self.log_path = LOG_PATH if os.getenv("INTENT_LOG", "0") == "1" else None
+        self.log_max_bytes = int(os.getenv("INTENT_LOG_MAX_BYTES", str(5 * 1024 * 1024)))
+        self.local = None
+        if os.getenv("INTENT_LOCAL", "1") != "0":
+            try:
+                self.local = LocalIntentClassifier.load_or_train()
+            except Exception as e:
+                print(f"[INTENT] ⚠️ Local classifier disabled: {e}")
+
+        # LLM classifications, keyed on the normalised message and shared across workers
+        self.cache = None
+        if os.getenv("INTENT_CACHE", "1") != "0":
+            try:
+                self.cache = IntentCache(
+                    path=os.getenv("INTENT_CACHE_PATH", INTENT_CACHE_PATH),
+                    memory_entries=int(os.getenv("INTENT_CACHE_MEMORY_SIZE", "1024")),
+                    max_entries=int(os.getenv("INTENT_CACHE_SIZE", "50000")),
+                    ttl=float(os.getenv("INTENT_CACHE_TTL", str(7 * 86400)))
+                )
+            except Exception as e:
+                print(f"[INTENT] ⚠️ Intent cache disabled: {e}")
+
+        # Micro-batching of concurrent LLM classifications (INTENT_BATCH_WINDOW_MS=0 = off)
+        self.batcher = None
+        batch_window = float(os.getenv("INTENT_BATCH_WINDOW_MS", "0"))
+        if batch_window > 0:
+            self.batcher = IntentBatcher(
+                self.llm, SYSTEM_PROMPT,
+                window_ms=batch_window,
+                max_batch=int(os.getenv("INTENT_BATCH_MAX", "16")),
+                timeout=self.llm.deadline + batch_window / 1000
+            )
+
+        self._lock = threading.Lock()
+        self.stats = {tier: {"calls": 0, "total_ms": 0.0, "max_ms": 0.0} for tier in ("cache", "local", "llm", "fallback")}
+
+    def _record(self, tier, started):
+        elapsed = (time.perf_counter() - started) * 1000
+        with self._lock:
+            tier_stats = self.stats[tier]
+            tier_stats["calls"] += 1
+            tier_stats["total_ms"] += elapsed
+            tier_stats["max_ms"] = max(tier_stats["max_ms"], elapsed)
+
+    def _log(self, message, result):
+        """Appends an LLM classification to the training log (see agent.intent_classifier)."""
+        if not self.log_path:
+            return
+        line = json.dumps({"message": message, "intent": result.get("intent"), "subject": result.get("subject")})
+        try:
+            with self._lock:
+                try:
+                    if self.log_max_bytes and os.path.getsize(self.log_path) >= self.log_max_bytes:
+                        os.replace(self.log_path, f"{self.log_path}.1")
+                except FileNotFoundError:
+                    pass
+                with open(self.log_path, "a", encoding="utf-8") as f:
+                    f.write(line + "\n")
+        except OSError as e:
+            print(f"[INTENT] ⚠️ Could not log classification: {e}")
+
+    def status(self):
+        total = sum(s["calls"] for s in self.stats.values())
+        tiers = {}
+        for tier, s in self.stats.items():
+            tiers[tier] = {
+                "calls": s["calls"],
+                "hit_rate": round(s["calls"] / total, 4) if total else None,
+                "avg_ms": round(s["total_ms"] / s["calls"], 3) if s["calls"] else None,
+                "max_ms": round(s["max_ms"], 3)
+            }
+        return {
+            "local_enabled": self.local is not None,
+            "local_threshold": self.local_threshold,
+            "tiers": tiers,
+            "cache": self.cache.stats() if self.cache else None,
+            "batching": self.batcher.stats() if self.batcher else None,
+            "llm": self.llm.stats()
+        }
+
+    def classify_local(self, message):
+        """Returns the local prediction if it clears the threshold, else None."""
+        if self.local is None:
+            return None
+        started = time.perf_counter()
+        prediction = self.local.predict(self.correct(message))
+        # An unrecognised subject may hide a typo only the LLM can fix;
+        # GENERAL_KNOWLEDGE subjects go to retrieval as free text anyway.
+        confident = prediction["confidence"] >= self.local_threshold and (
+            prediction["known_subject"] or prediction["intent"] == "GENERAL_KNOWLEDGE"
+        )
+        if not confident:
+            return None
+        self._record("local", started)
+        return {"intent": prediction["intent"], "subject": prediction["subject"], "tier": "local"}
+
     def classify_intent(self, message):
         """
-        1. Corrects typos (e.g. 'powet' -> 'power').
+        1. Corrects typos (e.g. 'powet' -> 'power'), locally via agent.vocab_matcher first.
         2. Identifies the Intent (Drill, Shot, Exercise, Rule, etc.).
         3. Extracts the clean Cricket Topic as 'subject'.
+        Tries the cache, then the local classifier; Gemini only sees the uncertain messages.
         """
-        system_prompt = """
-        You are the 'Brain' of a Cricket Coaching App. 
-        Analyze the user's query and return a JSON object with:
-        - "intent": One of [TECHNICAL_DRILL, EXERCISE, FUNDAMENTAL_INFO, SHOT_INFO, GENERAL_KNOWLEDGE, CODE_INPUT]
-        - "subject": The specific cricket topic, corrected for typos.
-
-        GUIDELINES:
-        1. **TECHNICAL_DRILL**: User wants to improve/practice a skill (e.g., "batting", "bowling", "fielding", "footwork", "timing").
-        2. **EXERCISE**: User wants fitness/gym work (e.g., "strength", "stamina", "warm up").
-        3. **FUNDAMENTAL_INFO**: User asks "what is" or "how to hold" (Definitions).
-        4. **GENERAL_KNOWLEDGE**: History, rules, or player facts.
-        5. **CODE_INPUT**: Short codes like "A1", "B2" or "more".
-        6. **SHOT_INFO**: User asks "how to play" or about a specific shot (e.g., "how to play cut shot", "cover drive technique", "pull shot").
-
-        EXAMPLES:
-        - "improve powet hitting" -> {"intent": "TECHNICAL_DRILL", "subject": "power hitting"}
-        - "drils for foot wrk" -> {"intent": "TECHNICAL_DRILL", "subject": "footwork"}
-        - "batting drills" -> {"intent": "TECHNICAL_DRILL", "subject": "batting"}
-        - "fitness for batting" -> {"intent": "EXERCISE", "subject": "batting fitness"}
-        - "who is sachin?" -> {"intent": "GENERAL_KNOWLEDGE", "subject": "Sachin Tendulkar"}
-        - "A2" -> {"intent": "CODE_INPUT", "subject": "A2"}
-        - "how to play cut shot" -> {"intent": "SHOT_INFO", "subject": "cut shot"}
-        - "drills for cut shot" -> {"intent": "SHOT_INFO", "subject": "cut shot"}
-
-        Return ONLY raw JSON.
-        """
+        return self.classify_fast(message) or self.classify_llm(message)
 
+    def classify_fast(self, message):
+        """Cache and local classifier only; None means Gemini is needed."""
+        if self.cache:
+            started = time.perf_counter()
+            cached = self.cache.get(message)
+            if cached:
+                self._record("cache", started)
+                cached["tier"] = "cache"
+                return cached
+
+        return self.classify_local(message)
+
+    def correct(self, message):
+        """Normalised message with misspelt cricket terms fixed ('powet' -> 'power')."""
+        return get_matcher().correct(message)
+
+    def guess_subject(self, message):
+        """Cheap subject guess (no LLM), used to start lookups before Gemini answers."""
+        if self.local is None:
+            return self.correct(message)
+        return self.local.extract_subject(self.correct(message))[0]
+
+    def guess_intent(self, message):
+        """Best local guess at the intent, however unsure (no LLM); only a hint for speculation."""
+        if self.local is None:
+            return self.classify_keywords(message)["intent"]
+        return self.local.predict(self.correct(message))["intent"]
+
+    def classify_llm(self, message):
+        started = time.perf_counter()
         try:
-            response = self.model.generate_content(f"{system_prompt}\nUser Query: {message}")
-            return json.loads(response.text)
+            if self.batcher:
+                result = self.batcher.classify(message)
+            else:
+                response = self.llm.generate_content(f"{SYSTEM_PROMPT}\nUser Query: {message}")
+                result = json.loads(response.text)
+            cost_ms = (time.perf_counter() - started) * 1000
+            self._record("llm", started)
+            self._log(message, result)
+            if self.cache:
+                self.cache.set(message, result, cost_ms)
+            result["tier"] = "llm"
+            return result
 
         except Exception as e:
             print(f"[ERROR] Intent Agent Failed: {e}")
-            # Fallback: Just return the original message as the subject
-            return {"intent": "UNKNOWN", "subject": message}
\ No newline at end of file
+            started = time.perf_counter()
+            result = self.classify_keywords(message)
+            self._record("fallback", started)
+            return result
+
+    def classify_keywords(self, message):
+        """Fallback: first KEYWORD_ROUTES hit, else UNKNOWN with the cleaned message as subject."""
+        text = self.correct(message)
+        subject = message
+        if self.local is not None:
+            subject = self.local.extract_subject(text)[0]
+        for intent, keywords in KEYWORD_ROUTES:
+            if any(k in text for k in keywords):
+                return {"intent": intent, "subject": subject, "tier": "fallback"}
+        return {"intent": "UNKNOWN", "subject": subject, "tier": "fallback"}
\ No newline at end of file
@@ -0,0 +1,126 @@
+import json
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+BATCH_INSTRUCTIONS = """
+You will receive a JSON array of user queries instead of a single query.
+Return a JSON array with exactly one object per query, in the same order.
+"""
+
+
+class BatchFormatError(ValueError):
+    """The model answered a batch, but not with one result per query."""
+
+
+class IntentBatcher:
+    """
+    Collects classify requests that arrive within `window_ms` of each other
+    (up to `max_batch`) and sends them to the model as one JSON-array prompt.
+    Callers block on a Future that receives their own item of the response;
+    if the array is malformed or the wrong length, each message is retried
+    on its own.
+    `model` only needs generate_content(prompt) -> object with .text, so a
+    stub can stand in for Gemini.
+    """
+
+    def __init__(self, model, prompt, window_ms=15, max_batch=16, concurrency=4, timeout=30):
+        self.model = model
+        self.prompt = prompt
+        self.window = window_ms / 1000
+        self.max_batch = max_batch
+        self.timeout = timeout
+        self._queue = queue.Queue()
+        # batches are sent concurrently so a slow call does not hold up the next window
+        self._pool = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="intent-batch")
+        self._lock = threading.Lock()
+        self.batches = 0
+        self.messages = 0
+        self.largest_batch = 0
+        self.failed_batches = 0
+        self.split_batches = 0
+
+        self._thread = threading.Thread(target=self._collect, name="intent-batcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, message):
+        future = Future()
+        self._queue.put((message, future))
+        return future
+
+    def classify(self, message):
+        """Blocks until the batch holding `message` is answered; raises on failure."""
+        return self.submit(message).result(timeout=self.timeout)
+
+    # ---------------------------------------------------
+    # COLLECT / DISPATCH
+    # ---------------------------------------------------
+    def _collect(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.window
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._pool.submit(self._dispatch, batch)
+
+    def _dispatch(self, batch):
+        messages = [message for message, _ in batch]
+        with self._lock:
+            self.batches += 1
+            self.messages += len(batch)
+            self.largest_batch = max(self.largest_batch, len(batch))
+
+        try:
+            if len(batch) == 1:
+                response = self.model.generate_content(f"{self.prompt}\nUser Query: {messages[0]}")
+                results = [json.loads(response.text)]
+            else:
+                response = self.model.generate_content(
+                    f"{self.prompt}\n{BATCH_INSTRUCTIONS}\nUser Queries: {json.dumps(messages)}"
+                )
+                results = self._parse_batch(response.text, len(batch))
+        except BatchFormatError:
+            # the model answered but mangled the array: give each caller its own call
+            with self._lock:
+                self.split_batches += 1
+            for item in batch:
+                self._pool.submit(self._dispatch, [item])
+            return
+        except Exception as e:
+            with self._lock:
+                self.failed_batches += 1
+            for _, future in batch:
+                future.set_exception(e)
+            return
+
+        for (_, future), result in zip(batch, results):
+            future.set_result(result)
+
+    @staticmethod
+    def _parse_batch(text, size):
+        try:
+            results = json.loads(text)
+        except ValueError as e:
+            raise BatchFormatError(f"batch response is not JSON: {e}") from None
+        if not isinstance(results, list) or len(results) != size:
+            raise BatchFormatError(f"expected a JSON array of {size} results")
+        return results
+
+    def stats(self):
+        return {
+            "window_ms": round(self.window * 1000, 1),
+            "max_batch": self.max_batch,
+            "batches": self.batches,
+            "messages": self.messages,
+            "avg_batch": round(self.messages / self.batches, 2) if self.batches else None,
+            "largest_batch": self.largest_batch,
+            "failed_batches": self.failed_batches,
+            "split_batches": self.split_batches
+        }
@@ -0,0 +1,158 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from .cache import LRUCache, normalize_text
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_PATH = os.path.join(BASE_DIR, "data", "intent_cache.sqlite3")
+
+# Rows are trimmed back to max_entries once every this many writes
+PRUNE_EVERY = 100
+
+
+class IntentCache:
+    """
+    Two-level cache of intent classifications keyed on the normalised message.
+    An in-process LRUCache sits in front of a SQLite file (WAL mode), so
+    entries survive restarts and are shared by every gunicorn worker.
+    Each entry remembers how long the original classification took, which
+    is what a hit saves.
+    """
+
+    def __init__(self, path=DEFAULT_PATH, memory_entries=1024, max_entries=50000, ttl=7 * 86400):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.memory = LRUCache(max_entries=memory_entries, ttl=ttl)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._writes = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.saved_ms = 0.0
+
+        with self._connect() as db:
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS intents ("
+                " key TEXT PRIMARY KEY, result TEXT NOT NULL, cost_ms REAL NOT NULL,"
+                " created_at REAL NOT NULL, used_at REAL NOT NULL)"
+            )
+            db.execute("CREATE INDEX IF NOT EXISTS intents_used_at ON intents (used_at)")
+
+    def _connect(self):
+        # sqlite3 connections are not shareable across threads; keep one per thread
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=5)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            self._local.db = db
+        return db
+
+    @staticmethod
+    def key(message):
+        return normalize_text(message)
+
+    def get(self, message):
+        """Returns a cached classification dict, or None."""
+        key = self.key(message)
+        entry = self.memory.get(key)
+        if entry is not None:
+            self._count_hit(entry[1])
+            return dict(entry[0])
+
+        now = time.time()
+        try:
+            db = self._connect()
+            row = db.execute("SELECT result, cost_ms, created_at FROM intents WHERE key = ?", (key,)).fetchone()
+            if row and self.ttl and row[2] <= now - self.ttl:
+                with db:
+                    db.execute("DELETE FROM intents WHERE key = ?", (key,))
+                row = None
+            if row:
+                with db:
+                    db.execute("UPDATE intents SET used_at = ? WHERE key = ?", (now, key))
+        except sqlite3.Error as e:
+            print(f"[INTENT] ⚠️ Intent cache read failed: {e}")
+            row = None
+
+        if row is None:
+            with self._lock:
+                self.misses += 1
+            return None
+
+        result = json.loads(row[0])
+        # only for what is left of the row's ttl, so memory never outlives the disk entry
+        remaining = self.ttl - (now - row[2]) if self.ttl else None
+        self.memory.set(key, (result, row[1]), ttl=remaining)
+        with self._lock:
+            self.disk_hits += 1
+        self._count_hit(row[1])
+        return dict(result)
+
+    def _count_hit(self, cost_ms):
+        with self._lock:
+            self.saved_ms += cost_ms
+
+    def set(self, message, result, cost_ms):
+        key = self.key(message)
+        if not key:
+            return
+        self.memory.set(key, (dict(result), cost_ms))
+
+        now = time.time()
+        try:
+            db = self._connect()
+            with db:
+                db.execute(
+                    "INSERT OR REPLACE INTO intents (key, result, cost_ms, created_at, used_at) VALUES (?, ?, ?, ?, ?)",
+                    (key, json.dumps(result), cost_ms, now, now)
+                )
+            with self._lock:
+                self._writes += 1
+                prune = self._writes % PRUNE_EVERY == 0
+            if prune:
+                self.prune()
+        except sqlite3.Error as e:
+            print(f"[INTENT] ⚠️ Intent cache write failed: {e}")
+
+    def prune(self):
+        """Drops expired rows, then the least recently used beyond max_entries."""
+        db = self._connect()
+        with db:
+            if self.ttl:
+                db.execute("DELETE FROM intents WHERE created_at < ?", (time.time() - self.ttl,))
+            db.execute(
+                "DELETE FROM intents WHERE key IN ("
+                " SELECT key FROM intents ORDER BY used_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            )
+
+    def clear(self):
+        self.memory.clear()
+        db = self._connect()
+        with db:
+            db.execute("DELETE FROM intents")
+
+    def stats(self):
+        memory = self.memory.stats()
+        try:
+            disk_size = self._connect().execute("SELECT COUNT(*) FROM intents").fetchone()[0]
+        except sqlite3.Error:
+            disk_size = None
+        hits = memory["hits"] + self.disk_hits
+        lookups = hits + self.misses
+        return {
+            "memory_size": memory["size"],
+            "disk_size": disk_size,
+            "max_entries": self.max_entries,
+            "ttl": self.ttl,
+            "memory_hits": memory["hits"],
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": round(hits / lookups, 4) if lookups else None,
+            "saved_ms": round(self.saved_ms, 1)
+        }
@@ -0,0 +1,222 @@
+"""
+Local fast-path intent classifier.
+
+    python -m agent.intent_classifier train     # rebuild data/intent_model.joblib
+    python -m agent.intent_classifier predict "cover drive technique"
+
+TF-IDF (word + character n-grams) into a logistic regression, trained on
+rules/intent_examples.json, phrases generated from the rule/engine
+vocabularies and, when INTENT_LOG=1, the LLM classifications logged in
+data/intent_log.jsonl (and its rotated .1 file). That log stores raw user
+messages, so it is off by default. IntentAgent only calls Gemini when this
+model is not confident.
+"""
+import json
+import os
+import sys
+import time
+
+from .cache import normalize_text
+
+try:
+    import joblib
+    from sklearn.linear_model import LogisticRegression
+    from sklearn.pipeline import FeatureUnion, make_pipeline
+    from sklearn.feature_extraction.text import TfidfVectorizer
+except ImportError:  # scikit-learn is optional; IntentAgent then uses the LLM only
+    joblib = None
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+EXAMPLES_PATH = os.path.join(BASE_DIR, "rules", "intent_examples.json")
+MODEL_PATH = os.path.join(BASE_DIR, "data", "intent_model.joblib")
+LOG_PATH = os.path.join(BASE_DIR, "data", "intent_log.jsonl")
+
+MODEL_VERSION = 1
+
+# Words that carry no topic; stripped to get the subject when no known phrase matches
+FILLER_WORDS = {
+    "a", "an", "the", "is", "are", "of", "to", "in", "on", "for", "and", "at",
+    "my", "me", "i", "you", "your", "please", "can", "could", "would", "should",
+    "how", "what", "who", "when", "where", "why", "do", "does", "did", "want",
+    "need", "give", "show", "tell", "teach", "help", "improve", "better", "get",
+    "some", "any", "about", "with", "play", "drill", "drills", "practice",
+    "exercise", "exercises", "workout", "technique", "explain", "hey", "hi"
+}
+
+# Templates used to turn vocabulary phrases into training sentences
+TEMPLATES = {
+    "TECHNICAL_DRILL": ["{} drills", "improve my {}", "how to improve {}", "practice {}", "{} training drills"],
+    "EXERCISE": ["{} exercises", "gym workout for {}", "fitness for {}", "{} workout"],
+    "FUNDAMENTAL_INFO": ["what is {}", "explain {}", "{} basics"],
+    "SHOT_INFO": ["how to play {}", "{} technique", "{}", "teach me the {}"],
+    "GENERAL_KNOWLEDGE": ["what is the rule for {}", "{} law", "tell me about {}"]
+}
+
+
+def _vocabulary():
+    """intent -> [topic phrases] from the rule files and the engines' keyword maps."""
+    from .exercise_engine import ExerciseEngine
+    from .tech_engine import TechEngine
+
+    def load(name):
+        with open(os.path.join(BASE_DIR, "rules", name), "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    shots = [s["name"].lower() for s in load("shots.json").values()]
+    fundamentals = [k for f in load("fundamentals.json").values() for k in f.get("keywords", [])]
+    roadmap = [k for r in load("roadmap.json").values() for k in r.get("trigger_keywords", [])]
+
+    return {
+        "TECHNICAL_DRILL": list(TechEngine().keyword_map),
+        "EXERCISE": list(ExerciseEngine.GOAL_MAP),
+        "FUNDAMENTAL_INFO": fundamentals + roadmap,
+        "SHOT_INFO": shots,
+        "GENERAL_KNOWLEDGE": []
+    }
+
+
+def load_examples(log_path=LOG_PATH):
+    """Returns [(message, intent, subject), ...] from seeds, vocabulary and the traffic log."""
+    with open(EXAMPLES_PATH, "r", encoding="utf-8") as f:
+        examples = [(e["message"], e["intent"], e["subject"]) for e in json.load(f)["examples"]]
+
+    for intent, phrases in _vocabulary().items():
+        for phrase in phrases:
+            for template in TEMPLATES[intent]:
+                examples.append((template.format(phrase), intent, phrase))
+
+    for path in (f"{log_path}.1", log_path) if log_path else ():
+        if not os.path.exists(path):
+            continue
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                if entry.get("intent") in TEMPLATES and entry.get("message"):
+                    examples.append((entry["message"], entry["intent"], entry.get("subject") or entry["message"]))
+
+    return examples
+
+
+class LocalIntentClassifier:
+    """
+    predict(message) -> {"intent", "subject", "confidence", "known_subject"}.
+    The subject is the longest known topic phrase in the message, else the
+    message with filler words removed (known_subject=False).
+    """
+
+    def __init__(self, pipeline, phrases):
+        self.pipeline = pipeline
+        # normalized phrase -> subject to hand to the engines
+        self.phrases = phrases
+        self._max_words = max((len(p.split()) for p in phrases), default=1)
+
+    # ---------------------------------------------------
+    # TRAIN / PERSIST
+    # ---------------------------------------------------
+    @classmethod
+    def train(cls, examples):
+        if joblib is None:
+            raise ImportError("scikit-learn / joblib are required for the local intent classifier")
+
+        texts = [normalize_text(m) for m, _, _ in examples]
+        labels = [intent for _, intent, _ in examples]
+        pipeline = make_pipeline(
+            FeatureUnion([
+                ("words", TfidfVectorizer(ngram_range=(1, 2), sublinear_tf=True)),
+                ("chars", TfidfVectorizer(analyzer="char_wb", ngram_range=(2, 4), sublinear_tf=True))
+            ]),
+            LogisticRegression(C=10.0, max_iter=2000)
+        )
+        pipeline.fit(texts, labels)
+
+        phrases = {}
+        for _, _, subject in examples:
+            key = normalize_text(subject)
+            if key and key not in FILLER_WORDS:
+                phrases.setdefault(key, subject)
+        return cls(pipeline, phrases)
+
+    def save(self, path=MODEL_PATH):
+        tmp_path = path + ".tmp"
+        joblib.dump({"version": MODEL_VERSION, "pipeline": self.pipeline, "phrases": self.phrases}, tmp_path)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path=MODEL_PATH):
+        if joblib is None:
+            raise ImportError("scikit-learn / joblib are required for the local intent classifier")
+        data = joblib.load(path)
+        if data.get("version") != MODEL_VERSION:
+            raise ValueError(f"intent model version {data.get('version')} != {MODEL_VERSION}")
+        return cls(data["pipeline"], data["phrases"])
+
+    @classmethod
+    def load_or_train(cls, path=MODEL_PATH):
+        """Loads the saved model, or trains one from the seed examples on first run."""
+        if os.path.exists(path):
+            try:
+                return cls.load(path)
+            except Exception as e:
+                print(f"[INTENT] ⚠️ Could not load {path} ({e}); retraining")
+
+        started = time.perf_counter()
+        model = cls.train(load_examples())
+        try:
+            model.save(path)
+        except OSError as e:
+            print(f"[INTENT] ⚠️ Could not save intent model: {e}")
+        print(f"[INTENT] ✅ Trained local intent model in {(time.perf_counter() - started) * 1000:.0f} ms")
+        return model
+
+    # ---------------------------------------------------
+    # PREDICT
+    # ---------------------------------------------------
+    def extract_subject(self, text):
+        words = text.split()
+        for size in range(min(self._max_words, len(words)), 0, -1):
+            for i in range(len(words) - size + 1):
+                phrase = " ".join(words[i:i + size])
+                if phrase in self.phrases:
+                    return self.phrases[phrase], True
+
+        topic = [w for w in words if w not in FILLER_WORDS]
+        return " ".join(topic) or text, False
+
+    def predict(self, message):
+        text = normalize_text(message)
+        probabilities = self.pipeline.predict_proba([text])[0]
+        best = probabilities.argmax()
+        subject, known = self.extract_subject(text)
+        return {
+            "intent": str(self.pipeline.classes_[best]),
+            "subject": subject,
+            "confidence": round(float(probabilities[best]), 4),
+            "known_subject": known
+        }
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv or argv[0] not in ("train", "predict"):
+        print("usage: python -m agent.intent_classifier train | predict <message>")
+        return 2
+
+    if argv[0] == "train":
+        examples = load_examples()
+        started = time.perf_counter()
+        model = LocalIntentClassifier.train(examples)
+        model.save()
+        print(f"[INTENT] ✅ Trained on {len(examples)} examples in "
+              f"{(time.perf_counter() - started) * 1000:.0f} ms -> {MODEL_PATH}")
+        return 0
+
+    model = LocalIntentClassifier.load_or_train()
+    print(json.dumps(model.predict(" ".join(argv[1:])), indent=4))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
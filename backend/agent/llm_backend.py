@@ -0,0 +1,170 @@
+"""
+Pluggable Gemini backend, selected with LLM_BACKEND:
+
+    live    (default) the real google.generativeai model; needs GOOGLE_API_KEY
+    record  live model, and every prompt/response is appended to the cassette
+    replay  serves responses from the cassette; no key or network needed
+
+LLM_CASSETTE            cassette path (default data/llm_cassette.jsonl)
+LLM_REPLAY_LATENCY_MS   synthetic latency per call, or "recorded" to reuse the
+                        latency captured while recording (default 0)
+LLM_REPLAY_JITTER_MS    +/- uniform jitter added to that latency (default 0)
+LLM_REPLAY_SEED         seed for the jitter, so runs are reproducible
+LLM_REPLAY_ON_MISS      "error" (default) raises for unknown prompts,
+                        "cycle" serves recorded responses round-robin
+"""
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_CASSETTE = os.path.join(BASE_DIR, "data", "llm_cassette.jsonl")
+
+BACKENDS = ("live", "record", "replay")
+
+
+def prompt_key(model_name, prompt):
+    return hashlib.sha1(f"{model_name}\n{prompt}".encode("utf-8")).hexdigest()
+
+
+class CannedResponse:
+    """Stands in for a Gemini response / stream chunk: only .text is used."""
+
+    __slots__ = ("text",)
+
+    def __init__(self, text):
+        self.text = text
+
+
+class RecordingModel:
+    """Passes calls to the live model and appends each exchange to the cassette."""
+
+    def __init__(self, model, model_name, path):
+        self.model = model
+        self.model_name = model_name
+        self.path = path
+        self._lock = threading.Lock()
+
+    def _write(self, prompt, chunks, started):
+        entry = {
+            "key": prompt_key(self.model_name, prompt),
+            "model": self.model_name,
+            "prompt": prompt,
+            "chunks": chunks,
+            "latency_ms": round((time.perf_counter() - started) * 1000, 1)
+        }
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry) + "\n")
+
+    def generate_content(self, prompt, stream=False, **kwargs):
+        started = time.perf_counter()
+        if not stream:
+            response = self.model.generate_content(prompt, **kwargs)
+            self._write(prompt, [response.text], started)
+            return response
+        return self._record_stream(prompt, started, **kwargs)
+
+    def _record_stream(self, prompt, started, **kwargs):
+        chunks = []
+        for chunk in self.model.generate_content(prompt, stream=True, **kwargs):
+            chunks.append(chunk.text)
+            yield chunk
+        self._write(prompt, chunks, started)
+
+
+class ReplayModel:
+    """Answers from a recorded cassette with configurable synthetic latency."""
+
+    def __init__(self, model_name, path, latency_ms=0.0, jitter_ms=0.0, seed=None, on_miss="error"):
+        self.model_name = model_name
+        self.path = path
+        self.latency_ms = latency_ms   # a number, or "recorded"
+        self.jitter_ms = jitter_ms
+        self.on_miss = on_miss
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._cursor = 0
+        self.hits = 0
+        self.misses = 0
+
+        # key -> entry; a later recording of the same prompt wins
+        self.entries = {}
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        entry = json.loads(line)
+                        if entry.get("model", model_name) == model_name:
+                            self.entries[entry["key"]] = entry
+        self._ordered = list(self.entries.values())
+        print(f"[LLM] 📼 Replaying {len(self.entries)} recorded responses for {model_name} from {path}")
+
+    def _lookup(self, prompt):
+        entry = self.entries.get(prompt_key(self.model_name, prompt))
+        with self._lock:
+            if entry is not None:
+                self.hits += 1
+                return entry
+            self.misses += 1
+            if self.on_miss != "cycle" or not self._ordered:
+                raise LookupError(f"prompt not in cassette {self.path}")
+            entry = self._ordered[self._cursor % len(self._ordered)]
+            self._cursor += 1
+            return entry
+
+    def _delay(self, entry):
+        base = entry.get("latency_ms", 0.0) if self.latency_ms == "recorded" else self.latency_ms
+        with self._lock:
+            jitter = self._random.uniform(-self.jitter_ms, self.jitter_ms) if self.jitter_ms else 0.0
+        return max(0.0, base + jitter) / 1000
+
+    def generate_content(self, prompt, stream=False, **kwargs):
+        entry = self._lookup(prompt)
+        delay = self._delay(entry)
+        if not stream:
+            time.sleep(delay)
+            return CannedResponse("".join(entry["chunks"]))
+        return self._replay_stream(entry["chunks"], delay)
+
+    @staticmethod
+    def _replay_stream(chunks, delay):
+        # the synthetic latency is spread across the chunks
+        step = delay / max(1, len(chunks))
+        for text in chunks:
+            time.sleep(step)
+            yield CannedResponse(text)
+
+
+def create_model(model_name, generation_config=None):
+    """Builds the Gemini model for the backend named by LLM_BACKEND."""
+    backend = os.getenv("LLM_BACKEND", "live").lower()
+    if backend not in BACKENDS:
+        raise ValueError(f"LLM_BACKEND must be one of {BACKENDS}, got {backend!r}")
+    cassette = os.getenv("LLM_CASSETTE", DEFAULT_CASSETTE)
+
+    if backend == "replay":
+        latency = os.getenv("LLM_REPLAY_LATENCY_MS", "0")
+        seed = os.getenv("LLM_REPLAY_SEED")
+        return ReplayModel(
+            model_name, cassette,
+            latency_ms=latency if latency == "recorded" else float(latency),
+            jitter_ms=float(os.getenv("LLM_REPLAY_JITTER_MS", "0")),
+            seed=int(seed) if seed else None,
+            on_miss=os.getenv("LLM_REPLAY_ON_MISS", "error")
+        )
+
+    import google.generativeai as genai
+
+    api_key = os.getenv("GOOGLE_API_KEY")
+    if not api_key:
+        raise ValueError("No GOOGLE_API_KEY found in .env file")
+    genai.configure(api_key=api_key)
+    model = genai.GenerativeModel(model_name=model_name, generation_config=generation_config)
+
+    if backend == "record":
+        print(f"[LLM] ⏺️ Recording {model_name} exchanges to {cassette}")
+        return RecordingModel(model, model_name, cassette)
+    return model
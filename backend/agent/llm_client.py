@@ -0,0 +1,219 @@
+import queue
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+
+class LLMUnavailable(Exception):
+    """The call missed its deadline, every attempt failed, or the breaker is open."""
+
+
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive failures/timeouts and rejects
+    calls for `reset_seconds`; then lets one trial call through (half-open)
+    and closes again if it succeeds.
+    """
+
+    def __init__(self, failure_threshold=5, reset_seconds=30):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.failures = 0
+        self.opened_at = None
+        self.trial_running = False
+        self.opens = 0
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_seconds:
+            return "half_open"
+        return "open"
+
+    def allow(self):
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return True
+            if state == "half_open" and not self.trial_running:
+                self.trial_running = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial_running = False
+
+    def release(self):
+        """A call ended without a verdict (e.g. an abandoned stream)."""
+        with self._lock:
+            self.trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.trial_running or self.failures >= self.failure_threshold:
+                if self.opened_at is None or self.trial_running:
+                    self.opens += 1
+                self.opened_at = time.monotonic()
+            self.trial_running = False
+
+
+class LLMClient:
+    """
+    Wraps a Gemini model (anything with generate_content) so every call has
+    a deadline. generate_content() returns the first successful attempt:
+    a hedge is started if the first is still running after `hedge_after`
+    seconds, and failed attempts are retried while time remains, up to
+    `max_attempts` in total. Raises LLMUnavailable instead of blocking.
+    Attempts still queued for a worker when the deadline passes are
+    cancelled and counted as queued_timeouts, not as provider failures.
+    """
+
+    def __init__(self, model, deadline=8.0, hedge_after=None, max_attempts=2, breaker=None, pool_size=8):
+        self.model = model
+        self.pool_size = pool_size
+        self.deadline = deadline
+        self.hedge_after = hedge_after
+        self.max_attempts = max_attempts
+        self.breaker = breaker or CircuitBreaker()
+        # Abandoned attempts keep running here until the provider gives up on them
+        self._pool = ThreadPoolExecutor(max_workers=pool_size, thread_name_prefix="llm")
+        self._lock = threading.Lock()
+        self.counts = {"calls": 0, "successes": 0, "failures": 0, "timeouts": 0,
+                       "queued_timeouts": 0, "hedges": 0, "retries": 0, "rejected": 0}
+
+    def _count(self, name):
+        with self._lock:
+            self.counts[name] += 1
+
+    def _admit(self):
+        self._count("calls")
+        if not self.breaker.allow():
+            self._count("rejected")
+            raise LLMUnavailable("circuit breaker open")
+
+    def generate_content(self, prompt, deadline=None, stream=False, **kwargs):
+        if stream:
+            return self.stream(prompt, deadline=deadline, **kwargs)
+
+        self._admit()
+        budget = deadline or self.deadline
+        ends_at = time.monotonic() + budget
+        pending = {self._pool.submit(self.model.generate_content, prompt, **kwargs)}
+        attempts = 1
+        hedge_at = time.monotonic() + self.hedge_after if self.hedge_after else None
+        last_error = None
+
+        while pending:
+            if attempts >= self.max_attempts:
+                hedge_at = None
+            now = time.monotonic()
+            wake = ends_at if hedge_at is None else min(ends_at, hedge_at)
+            done, pending = wait(pending, timeout=max(0.0, wake - now), return_when=FIRST_COMPLETED)
+
+            for future in done:
+                try:
+                    response = future.result()
+                except Exception as e:
+                    last_error = e
+                    continue
+                self._count("successes")
+                self.breaker.record_success()
+                return response
+
+            now = time.monotonic()
+            if now >= ends_at:
+                break
+            if attempts < self.max_attempts:
+                if done and not pending:
+                    attempts += 1
+                    self._count("retries")
+                    pending.add(self._pool.submit(self.model.generate_content, prompt, **kwargs))
+                elif hedge_at is not None and now >= hedge_at:
+                    attempts += 1
+                    hedge_at = None
+                    self._count("hedges")
+                    pending.add(self._pool.submit(self.model.generate_content, prompt, **kwargs))
+
+        # cancel() only succeeds for attempts that never reached the provider
+        started = [future for future in pending if not future.cancel()]
+        if pending and not started and last_error is None:
+            self._queued_timeout()
+            raise LLMUnavailable(f"no free LLM worker within {budget:.1f}s")
+        self.breaker.record_failure()
+        if started:
+            self._count("timeouts")
+            raise LLMUnavailable(f"no response within {budget:.1f}s")
+        self._count("failures")
+        raise LLMUnavailable(f"all {attempts} attempt(s) failed: {last_error}")
+
+    def _queued_timeout(self):
+        """The deadline passed before a worker was free: says nothing about the provider."""
+        self._count("queued_timeouts")
+        self.breaker.release()
+
+    def stream(self, prompt, deadline=None, **kwargs):
+        """
+        Yields response chunks; the whole stream must finish within the
+        deadline. Nothing is retried once a chunk has been handed out.
+        """
+        self._admit()
+        budget = deadline or self.deadline
+        ends_at = time.monotonic() + budget
+        chunks = queue.Queue()
+        end = object()
+        # set once nobody is reading any more; the producer then closes the upstream stream
+        stop = threading.Event()
+
+        def produce():
+            upstream = None
+            try:
+                upstream = self.model.generate_content(prompt, stream=True, **kwargs)
+                for chunk in upstream:
+                    if stop.is_set():
+                        return
+                    chunks.put(chunk)
+                chunks.put(end)
+            except Exception as e:
+                chunks.put(e)
+            finally:
+                close = getattr(upstream, "close", None)
+                if stop.is_set() and close is not None:
+                    close()
+
+        producer = self._pool.submit(produce)
+        try:
+            while True:
+                try:
+                    item = chunks.get(timeout=max(0.0, ends_at - time.monotonic()))
+                except queue.Empty:
+                    stop.set()
+                    if producer.cancel():
+                        self._queued_timeout()
+                        raise LLMUnavailable(f"no free LLM worker within {budget:.1f}s") from None
+                    self._count("timeouts")
+                    self.breaker.record_failure()
+                    raise LLMUnavailable(f"stream not finished within {budget:.1f}s") from None
+                if item is end:
+                    self._count("successes")
+                    self.breaker.record_success()
+                    return
+                if isinstance(item, Exception):
+                    self._count("failures")
+                    self.breaker.record_failure()
+                    raise LLMUnavailable(f"stream failed: {item}")
+                yield item
+        except GeneratorExit:
+            stop.set()
+            producer.cancel()
+            self.breaker.release()
+            raise
+
+    def stats(self):
+        return dict(self.counts, breaker=self.breaker.state, breaker_opens=self.breaker.opens,
+                    deadline=self.deadline, hedge_after=self.hedge_after, pool_size=self.pool_size)
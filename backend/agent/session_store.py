@@ -0,0 +1,235 @@
+"""
+Per-user conversation memory for ConversationRouter ("more" pagination,
+last category / area).
+
+SESSION_BACKEND   memory (default) or sqlite; use sqlite when gunicorn runs
+                  several workers so a follow-up can land on any of them
+SESSION_MAX       sessions kept before the least recently used is evicted
+SESSION_IDLE_TTL  seconds without a message before a session is dropped
+SESSION_DB        SQLite path (default data/sessions.sqlite3)
+"""
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_DB = os.path.join(BASE_DIR, "data", "sessions.sqlite3")
+
+# Expired / surplus SQLite rows are pruned once every this many saves
+PRUNE_EVERY = 200
+
+
+class Session:
+    """One user's conversation state."""
+
+    FIELDS = ("last_area", "tech_last_category", "tech_last_area", "tech_drill_index", "last_exercise_goal")
+    __slots__ = ("user_id", "touched_at") + FIELDS
+
+    def __init__(self, user_id):
+        self.user_id = user_id
+        self.touched_at = time.time()
+        self.last_area = None
+        self.tech_last_category = None
+        self.tech_last_area = None
+        self.tech_drill_index = 0
+        self.last_exercise_goal = None
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in self.FIELDS}
+
+    @classmethod
+    def from_dict(cls, user_id, data, touched_at=None):
+        session = cls(user_id)
+        for name in cls.FIELDS:
+            if name in data:
+                setattr(session, name, data[name])
+        if touched_at is not None:
+            session.touched_at = touched_at
+        return session
+
+    def size_bytes(self):
+        """Approximate memory held by this record and its values."""
+        return sys.getsizeof(self) + sum(
+            sys.getsizeof(getattr(self, name)) for name in self.__slots__
+        )
+
+
+class MemorySessionStore:
+    """In-process sessions: LRU eviction past max_sessions, dropped after idle_ttl."""
+
+    backend = "memory"
+
+    def __init__(self, max_sessions=10000, idle_ttl=3600):
+        self.max_sessions = max_sessions
+        self.idle_ttl = idle_ttl
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+        self.created = 0
+        self.evicted_lru = 0
+        self.evicted_idle = 0
+
+    def get(self, user_id):
+        """Returns the user's session, starting a fresh one if missing or idle."""
+        now = time.time()
+        with self._lock:
+            session = self._sessions.get(user_id)
+            if session is not None and self.idle_ttl and now - session.touched_at > self.idle_ttl:
+                del self._sessions[user_id]
+                self.evicted_idle += 1
+                session = None
+            if session is None:
+                session = Session(user_id)
+                self._sessions[user_id] = session
+                self.created += 1
+                self._evict()
+            self._sessions.move_to_end(user_id)
+            session.touched_at = now
+            return session
+
+    def save(self, session):
+        # the session object is shared; only recency needs refreshing
+        with self._lock:
+            session.touched_at = time.time()
+
+    def _evict(self):
+        # idle sessions first (the oldest are at the front), then plain LRU overflow
+        if self.idle_ttl:
+            cutoff = time.time() - self.idle_ttl
+            while self._sessions:
+                oldest = next(iter(self._sessions.values()))
+                if oldest.touched_at >= cutoff:
+                    break
+                self._sessions.popitem(last=False)
+                self.evicted_idle += 1
+        while len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)
+            self.evicted_lru += 1
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def stats(self):
+        with self._lock:
+            sample = list(self._sessions.values())[-100:]
+        avg = sum(s.size_bytes() for s in sample) / len(sample) if sample else None
+        return {
+            "backend": self.backend,
+            "sessions": len(self._sessions),
+            "max_sessions": self.max_sessions,
+            "idle_ttl": self.idle_ttl,
+            "created": self.created,
+            "evicted_lru": self.evicted_lru,
+            "evicted_idle": self.evicted_idle,
+            "avg_session_bytes": round(avg) if avg else None
+        }
+
+
+class SQLiteSessionStore:
+    """
+    Sessions in a SQLite file (WAL mode) so every gunicorn worker sees the
+    same "more" pagination state. Each get reads the row fresh.
+    """
+
+    backend = "sqlite"
+
+    def __init__(self, path=DEFAULT_DB, max_sessions=10000, idle_ttl=3600):
+        self.path = path
+        self.max_sessions = max_sessions
+        self.idle_ttl = idle_ttl
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._saves = 0
+        self.created = 0
+        self.evicted_lru = 0
+        self.evicted_idle = 0
+
+        with self._connect() as db:
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS sessions ("
+                " user_id TEXT PRIMARY KEY, data TEXT NOT NULL, touched_at REAL NOT NULL)"
+            )
+            db.execute("CREATE INDEX IF NOT EXISTS sessions_touched_at ON sessions (touched_at)")
+
+    def _connect(self):
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=5)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            self._local.db = db
+        return db
+
+    def get(self, user_id):
+        key = str(user_id)
+        row = self._connect().execute(
+            "SELECT data, touched_at FROM sessions WHERE user_id = ?", (key,)
+        ).fetchone()
+        now = time.time()
+        if row and not (self.idle_ttl and now - row[1] > self.idle_ttl):
+            return Session.from_dict(user_id, json.loads(row[0]), touched_at=now)
+
+        with self._lock:
+            if row:
+                self.evicted_idle += 1
+            self.created += 1
+        return Session(user_id)
+
+    def save(self, session):
+        session.touched_at = time.time()
+        db = self._connect()
+        with db:
+            db.execute(
+                "INSERT OR REPLACE INTO sessions (user_id, data, touched_at) VALUES (?, ?, ?)",
+                (str(session.user_id), json.dumps(session.to_dict()), session.touched_at)
+            )
+        with self._lock:
+            self._saves += 1
+            prune = self._saves % PRUNE_EVERY == 0
+        if prune:
+            self.prune()
+
+    def prune(self):
+        db = self._connect()
+        with db:
+            if self.idle_ttl:
+                cur = db.execute("DELETE FROM sessions WHERE touched_at < ?", (time.time() - self.idle_ttl,))
+                self.evicted_idle += cur.rowcount
+            cur = db.execute(
+                "DELETE FROM sessions WHERE user_id IN ("
+                " SELECT user_id FROM sessions ORDER BY touched_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_sessions,)
+            )
+            self.evicted_lru += cur.rowcount
+
+    def __len__(self):
+        return self._connect().execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+
+    def stats(self):
+        db = self._connect()
+        count, data_bytes = db.execute("SELECT COUNT(*), COALESCE(SUM(LENGTH(data)), 0) FROM sessions").fetchone()
+        return {
+            "backend": self.backend,
+            "sessions": count,
+            "max_sessions": self.max_sessions,
+            "idle_ttl": self.idle_ttl,
+            "created": self.created,
+            "evicted_lru": self.evicted_lru,
+            "evicted_idle": self.evicted_idle,
+            "avg_session_bytes": round(data_bytes / count) if count else None
+        }
+
+
+def create_session_store():
+    """Builds the store named by SESSION_BACKEND."""
+    backend = os.getenv("SESSION_BACKEND", "memory").lower()
+    max_sessions = int(os.getenv("SESSION_MAX", "10000"))
+    idle_ttl = float(os.getenv("SESSION_IDLE_TTL", "3600"))
+    if backend == "sqlite":
+        return SQLiteSessionStore(os.getenv("SESSION_DB", DEFAULT_DB), max_sessions, idle_ttl)
+    if backend != "memory":
+        raise ValueError(f"SESSION_BACKEND must be 'memory' or 'sqlite', got {backend!r}")
+    return MemorySessionStore(max_sessions, idle_ttl)
@@ -1,6 +1,8 @@
 import json
 import os
 
+from .vocab_matcher import get_matcher
+
 class TechEngine:
 
     def __init__(self):
@@ -309,7 +311,12 @@ class TechEngine:
         if mapped:
             return mapped
 
-        # 2️⃣ Legacy text match
+        # 2️⃣ Same keywords, tolerating typos ("powet hitting")
+        cat_id = get_matcher().lookup(text, "tech_category")
+        if cat_id:
+            return self.get_category_by_id(cat_id)
+
+        # 3️⃣ Legacy text match
         for cat in self.categories:
 
             if cat["category_name"].lower() in text:
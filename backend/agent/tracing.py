@@ -0,0 +1,153 @@
+"""
+Lightweight per-stage latency tracing.
+
+    from agent.tracing import tracer
+    with tracer.span("rag_search"):
+        ...
+
+Every span feeds a fixed-bucket histogram (exported by /api/metrics). Spans
+opened while a request trace is active are also collected for that
+request's Server-Timing header. TRACING=0 turns span() into a shared no-op.
+"""
+import bisect
+import contextlib
+import os
+import threading
+import time
+
+# Histogram upper bounds in milliseconds; the last bucket is open-ended
+BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000, float("inf"))
+
+_NOOP = contextlib.nullcontext()
+
+
+class Histogram:
+    """Fixed-bucket latency histogram with count / sum / max."""
+
+    __slots__ = ("counts", "count", "total_ms", "max_ms")
+
+    def __init__(self):
+        self.counts = [0] * len(BUCKETS_MS)
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def observe(self, ms):
+        self.counts[bisect.bisect_left(BUCKETS_MS, ms)] += 1
+        self.count += 1
+        self.total_ms += ms
+        if ms > self.max_ms:
+            self.max_ms = ms
+
+    def percentile(self, pct):
+        """Upper bound of the bucket holding the pct-th sample (max for the open bucket)."""
+        if not self.count:
+            return None
+        rank = pct / 100 * self.count
+        seen = 0
+        for bound, n in zip(BUCKETS_MS, self.counts):
+            seen += n
+            if seen >= rank:
+                return round(min(bound, self.max_ms), 3)
+        return round(self.max_ms, 3)
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "avg_ms": round(self.total_ms / self.count, 3) if self.count else None,
+            "p50_ms": self.percentile(50),
+            "p90_ms": self.percentile(90),
+            "p99_ms": self.percentile(99),
+            "max_ms": round(self.max_ms, 3)
+        }
+
+
+class _Span:
+    __slots__ = ("tracer", "name", "started")
+
+    def __init__(self, tracer, name):
+        self.tracer = tracer
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.tracer.record(self.name, (time.perf_counter() - self.started) * 1000)
+        return False
+
+
+class Tracer:
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self.histograms = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def span(self, name):
+        if not self.enabled:
+            return _NOOP
+        return _Span(self, name)
+
+    def record(self, name, ms):
+        with self._lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = Histogram()
+            histogram.observe(ms)
+        trace = getattr(self._local, "trace", None)
+        if trace is not None:
+            trace.append((name, ms))
+
+    # ---------------------------------------------------
+    # PER-REQUEST TRACE
+    # ---------------------------------------------------
+    def start(self):
+        if self.enabled:
+            self._local.trace = []
+
+    def finish(self):
+        """Ends the current request trace; returns its [(name, ms), ...]."""
+        trace = getattr(self._local, "trace", None)
+        self._local.trace = None
+        return trace or []
+
+    @staticmethod
+    def server_timing(spans):
+        """[(name, ms)] -> 'intent;dur=12.3, rag_search;dur=4.1' (repeated names are summed)."""
+        totals = {}
+        for name, ms in spans:
+            totals[name] = totals.get(name, 0.0) + ms
+        return ", ".join(f"{name};dur={ms:.1f}" for name, ms in totals.items())
+
+    # ---------------------------------------------------
+    # EXPORT
+    # ---------------------------------------------------
+    def snapshot(self):
+        with self._lock:
+            return {name: h.summary() for name, h in sorted(self.histograms.items())}
+
+    def prometheus(self):
+        """Histograms in the Prometheus text exposition format (seconds)."""
+        lines = [
+            "# HELP crickmate_span_seconds Time spent in each chat pipeline stage.",
+            "# TYPE crickmate_span_seconds histogram"
+        ]
+        with self._lock:
+            for name, h in sorted(self.histograms.items()):
+                cumulative = 0
+                for bound, n in zip(BUCKETS_MS, h.counts):
+                    cumulative += n
+                    le = "+Inf" if bound == float("inf") else f"{bound / 1000:g}"
+                    lines.append(f'crickmate_span_seconds_bucket{{span="{name}",le="{le}"}} {cumulative}')
+                lines.append(f'crickmate_span_seconds_sum{{span="{name}"}} {h.total_ms / 1000:.6f}')
+                lines.append(f'crickmate_span_seconds_count{{span="{name}"}} {h.count}')
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        with self._lock:
+            self.histograms.clear()
+
+
+tracer = Tracer(enabled=os.getenv("TRACING", "1") != "0")
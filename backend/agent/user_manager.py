@@ -1,60 +1,390 @@
+"""
+Registered player profiles.
+
+Profiles live in a SQLite file (WAL mode) keyed on user_id, so get_user is
+a primary-key lookup instead of a re-parse and scan of the whole roster.
+On first start the legacy data/user_profiles.json is imported once; the
+JSON file is left in place but no longer written.
+
+Registration is an append to SQLite's write-ahead log, so its cost does not
+grow with the roster. IDs come from a sequence row bumped inside a
+BEGIN IMMEDIATE transaction, which serialises allocation across gunicorn
+workers. A background thread checkpoints (compacts) the WAL into the main
+database so commits never stall on it.
+
+get_profile() hands out UserProfile objects cached per (user_id, version);
+every write bumps the row's version, so a stale profile is never served,
+even when another worker made the change.
+
+USER_DB                   SQLite path (default data/users.sqlite3)
+USER_PROFILES             legacy JSON to migrate from (default data/user_profiles.json)
+USER_SYNC                 fsync policy: full (default, fsync every registration),
+                          normal (may lose the last commits on power loss), off
+USER_CHECKPOINT_SECONDS   background checkpoint interval; 0 = SQLite's inline autocheckpoint
+USER_WAL_MAX_BYTES        WAL size that triggers a truncating checkpoint
+USER_PROFILE_CACHE_SIZE   UserProfile objects kept in memory
+USER_IMPORT_BATCH         rows per executemany in bulk imports
+USER_IMPORT_MAX_ROWS      rows accepted by one bulk import
+"""
+import csv
 import json
 import os
+import sqlite3
+import threading
+import time
+
+from .cache import LRUCache
+from .input_validator import get_validator
 from .user_profile import UserProfile
 
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_DB = os.path.join(BASE_DIR, "data", "users.sqlite3")
+DEFAULT_PROFILES = os.path.join(BASE_DIR, "data", "user_profiles.json")
+
+SYNC_MODES = ("off", "normal", "full", "extra")
+
+
+# ---------------------------------------------------
+# BULK IMPORT PARSERS: yield (line, row, error)
+# ---------------------------------------------------
+def parse_ndjson(lines):
+    """One JSON object per line; blank lines are skipped."""
+    for number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as e:
+            yield number, None, f"Invalid JSON: {e}"
+            continue
+        if not isinstance(row, dict):
+            yield number, None, "Each line must be a JSON object."
+            continue
+        yield number, row, None
+
+
+def parse_csv(lines):
+    """
+    CSV with a header row. Whole-number cells in the columns the rules type
+    as int (plus weekly_days) become ints, so a name like "007" stays text;
+    empty cells are treated as missing.
+    """
+    int_fields = get_validator().int_fields() | {"weekly_days"}
+    reader = csv.DictReader(lines)
+    for row in reader:
+        record = {}
+        for key, value in row.items():
+            if key is None or value is None:
+                continue
+            value = value.strip()
+            if not value:
+                continue
+            key = key.strip().lstrip("\ufeff")
+            record[key] = int(value) if key in int_fields and value.lstrip("-").isdigit() else value
+        # DictReader counts the header, so this is the row's line in the file
+        yield reader.line_num, record, None
+
+
 class UserManager:
 
-    def __init__(self):
-        base_path = os.path.dirname(os.path.dirname(__file__))
-        self.profile_path = os.path.join(base_path, "data", "user_profiles.json")
+    def __init__(self, db_path=None, profile_path=None, sync=None, checkpoint_seconds=None):
+        self.db_path = db_path or os.getenv("USER_DB", DEFAULT_DB)
+        self.profile_path = profile_path or os.getenv("USER_PROFILES", DEFAULT_PROFILES)
+        self.sync = (sync or os.getenv("USER_SYNC", "full")).lower()
+        if self.sync not in SYNC_MODES:
+            raise ValueError(f"USER_SYNC must be one of {SYNC_MODES}, got {self.sync!r}")
+        if checkpoint_seconds is None:
+            checkpoint_seconds = float(os.getenv("USER_CHECKPOINT_SECONDS", "30"))
+        self.checkpoint_seconds = checkpoint_seconds
+        self.wal_max_bytes = int(os.getenv("USER_WAL_MAX_BYTES", str(16 * 1024 * 1024)))
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.registered = 0
+        self.checkpoints = 0
+        self.last_checkpoint = None
+        # user_id -> (version, UserProfile)
+        self.profiles = LRUCache(max_entries=int(os.getenv("USER_PROFILE_CACHE_SIZE", "4096")))
+
+        with self._connect() as db:
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS users ("
+                " user_id TEXT PRIMARY KEY, data TEXT NOT NULL, created_at REAL NOT NULL,"
+                " version INTEGER NOT NULL DEFAULT 1)"
+            )
+            columns = {row[1] for row in db.execute("PRAGMA table_info(users)")}
+            if "version" not in columns:
+                db.execute("ALTER TABLE users ADD COLUMN version INTEGER NOT NULL DEFAULT 1")
+            db.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+            db.execute("CREATE TABLE IF NOT EXISTS sequences (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+        self._migrate()
+
+        self._stop = threading.Event()
+        if self.checkpoint_seconds > 0:
+            threading.Thread(target=self._checkpoint_loop, name="user-wal-checkpoint", daemon=True).start()
+
+    def _connect(self):
+        # sqlite3 connections are not shareable across threads; keep one per thread
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.db_path, timeout=5)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute(f"PRAGMA synchronous={self.sync.upper()}")
+            if self.checkpoint_seconds > 0:
+                # the background thread owns checkpointing; commits only append
+                db.execute("PRAGMA wal_autocheckpoint=0")
+            self._local.db = db
+        return db
+
+    # ---------------------------------------------------
+    # ONE-SHOT MIGRATION FROM user_profiles.json
+    # ---------------------------------------------------
+    def _migrate(self):
+        db = self._connect()
+        users = []
+        with db:
+            # BEGIN IMMEDIATE: two workers starting together must not both import
+            db.execute("BEGIN IMMEDIATE")
+            done = db.execute("SELECT value FROM meta WHERE key = 'migrated_from'").fetchone()
+            if not done:
+                if os.path.exists(self.profile_path):
+                    with open(self.profile_path, "r", encoding="utf-8") as f:
+                        users = json.load(f).get("users", [])
+                now = time.time()
+                db.executemany(
+                    "INSERT OR IGNORE INTO users (user_id, data, created_at) VALUES (?, ?, ?)",
+                    [(u["user_id"], json.dumps(u), now) for u in users]
+                )
+                db.execute(
+                    "INSERT INTO meta (key, value) VALUES ('migrated_from', ?)",
+                    (json.dumps({"path": self.profile_path, "users": len(users), "at": now}),)
+                )
 
-        if not os.path.exists(self.profile_path):
-            with open(self.profile_path, "w") as f:
-                json.dump({"users": []}, f)
+            # Stores created before the sequence existed: continue after the highest ID
+            if not db.execute("SELECT 1 FROM sequences WHERE name = 'user_id'").fetchone():
+                highest = 0
+                for (user_id,) in db.execute("SELECT user_id FROM users"):
+                    if user_id.startswith("USER") and user_id[4:].isdigit():
+                        highest = max(highest, int(user_id[4:]))
+                db.execute("INSERT INTO sequences (name, value) VALUES ('user_id', ?)", (highest,))
+        if users:
+            print(f"[USERS] ✅ Migrated {len(users)} profiles from {self.profile_path}")
 
-    def _load_users(self):
-        with open(self.profile_path, "r") as f:
-            return json.load(f)
+    # ---------------------------------------------------
+    # WAL COMPACTION
+    # ---------------------------------------------------
+    def checkpoint(self, truncate=False):
+        """Copies committed WAL frames into the database; TRUNCATE also resets the WAL file."""
+        mode = "TRUNCATE" if truncate else "PASSIVE"
+        busy, wal_frames, copied = self._connect().execute(f"PRAGMA wal_checkpoint({mode})").fetchone()
+        with self._lock:
+            self.checkpoints += 1
+            self.last_checkpoint = {"mode": mode.lower(), "busy": bool(busy), "wal_frames": wal_frames,
+                                    "copied": copied, "at": time.time()}
+        return self.last_checkpoint
 
-    def _save_users(self, data):
-        with open(self.profile_path, "w") as f:
-            json.dump(data, f, indent=4)
+    def _wal_bytes(self):
+        try:
+            return os.path.getsize(self.db_path + "-wal")
+        except OSError:
+            return 0
 
+    def _checkpoint_loop(self):
+        while not self._stop.wait(self.checkpoint_seconds):
+            try:
+                self.checkpoint(truncate=self._wal_bytes() > self.wal_max_bytes)
+            except sqlite3.Error as e:
+                print(f"[USERS] ⚠️ WAL checkpoint failed: {e}")
+
+    def close(self):
+        """Stops the checkpoint thread after a final truncating checkpoint."""
+        self._stop.set()
+        try:
+            self.checkpoint(truncate=True)
+        except sqlite3.Error as e:
+            print(f"[USERS] ⚠️ WAL checkpoint failed: {e}")
+
+    # ---------------------------------------------------
+    # REGISTER / LOOKUP
+    # ---------------------------------------------------
     def register_user(self, user_data):
         # validate base structure
+        user_data = UserProfile.normalise_input(user_data)
         valid, msg = UserProfile.validate_inputs(user_data)
         if not valid:
             return False, msg
 
         # build new profile object
-        user = UserProfile(**user_data)
-
-        # create user_id
-        users = self._load_users()
-        new_id = "USER" + str(len(users["users"]) + 1).zfill(4)
-
-        # store user
-        users["users"].append({
-            "user_id": new_id,
-            "name": user.name, 
-            "age": user.age,
-            "height_cm": user.height_cm,
-            "weight_kg": user.weight_kg,
-            "age_group": user.age_group,
-            "bmi": user.bmi,
-            "bmi_group": user.bmi_group,
-            "skill_level": user.skill_level,
-            "playing_role": user.playing_role,
-            "weekly_days": user.weekly_days
-        })
-
-        self._save_users(users)
+        user = UserProfile.from_input(user_data)
+        record = user.to_record()
+
+        # allocate user_id and store user in one write transaction; BEGIN IMMEDIATE
+        # takes the write lock up front, so two workers can never read the same sequence value
+        db = self._connect()
+        with db:
+            db.execute("BEGIN IMMEDIATE")
+            db.execute("UPDATE sequences SET value = value + 1 WHERE name = 'user_id'")
+            number = db.execute("SELECT value FROM sequences WHERE name = 'user_id'").fetchone()[0]
+            new_id = "USER" + str(number).zfill(4)
+            db.execute(
+                "INSERT INTO users (user_id, data, created_at) VALUES (?, ?, ?)",
+                (new_id, json.dumps({"user_id": new_id, **record}), time.time())
+            )
+        with self._lock:
+            self.registered += 1
 
         return True, new_id
 
+    def update_user(self, user_id, changes):
+        """
+        Applies changed profile fields, recomputing the derived ones; bumps the
+        record version. Only the changed fields are validated, so legacy
+        records that predate a rule (e.g. no name) can still be updated.
+        """
+        changes = UserProfile.normalise_input(changes)
+        valid, msg = UserProfile.validate_changes(changes)
+        if not valid:
+            return False, msg
+        db = self._connect()
+        with db:
+            db.execute("BEGIN IMMEDIATE")
+            row = db.execute("SELECT data FROM users WHERE user_id = ?", (user_id,)).fetchone()
+            if not row:
+                return False, "User not found"
+            current = json.loads(row[0])
+            fields = {f: current.get(f) for f in UserProfile.FIELDS}
+            fields.update({f: v for f, v in changes.items() if f in UserProfile.FIELDS})
+            fields = UserProfile.normalise_input(fields)
+            # the derived age group and BMI need these even if the stored record lacks them
+            missing = next((f for f in ("age", "height_cm", "weight_kg") if fields.get(f) is None), None)
+            if missing:
+                return False, f"Missing required field: {missing}"
+            record = {**current, **UserProfile.from_input(fields).to_record()}
+            db.execute(
+                "UPDATE users SET data = ?, version = version + 1 WHERE user_id = ?",
+                (json.dumps(record), user_id)
+            )
+        self.profiles.pop(user_id)
+        return True, record
+
     def get_user(self, user_id):
-        users = self._load_users()["users"]
-        for u in users:
-            if u["user_id"] == user_id:
-                return True, u
+        row = self._connect().execute("SELECT data FROM users WHERE user_id = ?", (user_id,)).fetchone()
+        if row:
+            return True, json.loads(row[0])
         return False, "User not found"
+
+    def get_profile(self, user_id):
+        """UserProfile for user_id, or None. Reads only the version column when the cached copy is current."""
+        db = self._connect()
+        row = db.execute("SELECT version FROM users WHERE user_id = ?", (user_id,)).fetchone()
+        if not row:
+            return None
+        cached = self.profiles.get(user_id)
+        if cached is not None and cached[0] == row[0]:
+            return cached[1]
+
+        row = db.execute("SELECT data, version FROM users WHERE user_id = ?", (user_id,)).fetchone()
+        if not row:
+            return None
+        profile = UserProfile.from_record(json.loads(row[0]))
+        self.profiles.set(user_id, (row[1], profile))
+        return profile
+
+    # ---------------------------------------------------
+    # BULK IMPORT / EXPORT
+    # ---------------------------------------------------
+    def import_users(self, rows, batch_size=None, max_rows=None):
+        """
+        rows: (line, row, error) from parse_ndjson / parse_csv.
+        Rows are parsed, then validated together with validate_many; the valid ones are written
+        in a single transaction (executemany in batches) with a contiguous
+        block of IDs. Invalid rows are reported and skipped.
+        """
+        batch_size = batch_size or int(os.getenv("USER_IMPORT_BATCH", "500"))
+        max_rows = max_rows or int(os.getenv("USER_IMPORT_MAX_ROWS", "50000"))
+        parsed = []   # (line, row)
+        errors = []
+        for line, row, error in rows:
+            if len(parsed) + len(errors) >= max_rows:
+                errors.append({"line": line, "error": f"Import limited to {max_rows} rows."})
+                break
+            if error is None:
+                parsed.append((line, UserProfile.normalise_input(row)))
+            else:
+                errors.append({"line": line, "error": error})
+
+        valid = []    # (line, record)
+        checks = get_validator().validate_many([row for _, row in parsed])
+        for (line, row), (ok, error) in zip(parsed, checks):
+            if ok:
+                try:
+                    valid.append((line, UserProfile.from_input(row).to_record()))
+                    continue
+                except (TypeError, ValueError, ZeroDivisionError) as e:
+                    error = f"Invalid profile: {e}"
+            errors.append({"line": line, "error": error})
+        errors.sort(key=lambda e: e["line"])
+
+        imported = []
+        if valid:
+            now = time.time()
+            db = self._connect()
+            with db:
+                db.execute("BEGIN IMMEDIATE")
+                db.execute("UPDATE sequences SET value = value + ? WHERE name = 'user_id'", (len(valid),))
+                last = db.execute("SELECT value FROM sequences WHERE name = 'user_id'").fetchone()[0]
+                first = last - len(valid) + 1
+                for start in range(0, len(valid), batch_size):
+                    batch = []
+                    for offset, (line, record) in enumerate(valid[start:start + batch_size], start=start):
+                        user_id = "USER" + str(first + offset).zfill(4)
+                        batch.append((user_id, json.dumps({"user_id": user_id, **record}), now))
+                        imported.append({"line": line, "user_id": user_id})
+                    db.executemany("INSERT INTO users (user_id, data, created_at) VALUES (?, ?, ?)", batch)
+            with self._lock:
+                self.registered += len(imported)
+            print(f"[USERS] ✅ Imported {len(imported)} profiles ({len(errors)} rejected)")
+
+        return {"imported": len(imported), "failed": len(errors), "users": imported, "errors": errors}
+
+    def iter_users(self, page_size=500, after=None):
+        """
+        Iterator over the stored user records in registration order, one page
+        per query; `after` resumes past a user_id. An unknown `after` raises
+        KeyError here, before anything is yielded.
+        """
+        db = self._connect()
+        last_rowid = 0
+        if after:
+            row = db.execute("SELECT rowid FROM users WHERE user_id = ?", (after,)).fetchone()
+            if not row:
+                raise KeyError(after)
+            last_rowid = row[0]
+        return self._iter_pages(last_rowid, page_size)
+
+    def _iter_pages(self, last_rowid, page_size):
+        db = self._connect()
+        while True:
+            page = db.execute(
+                "SELECT rowid, data FROM users WHERE rowid > ? ORDER BY rowid LIMIT ?",
+                (last_rowid, page_size)
+            ).fetchall()
+            for rowid, data in page:
+                yield json.loads(data)
+            if len(page) < page_size:
+                return
+            last_rowid = page[-1][0]
+
+    def __len__(self):
+        return self._connect().execute("SELECT COUNT(*) FROM users").fetchone()[0]
+
+    def stats(self):
+        return {
+            "users": len(self),
+            "registered": self.registered,
+            "sync": self.sync,
+            "checkpoint_seconds": self.checkpoint_seconds,
+            "wal_bytes": self._wal_bytes(),
+            "checkpoints": self.checkpoints,
+            "last_checkpoint": self.last_checkpoint,
+            "profile_cache": self.profiles.stats()
+        }
@@ -1,7 +1,17 @@
-import json
-import os
+from .input_validator import get_validator
 
 class UserProfile:
+    """
+    A player's profile. Stored records already carry age_group / bmi /
+    bmi_group, so from_record() fills the slots directly instead of
+    recomputing them. Instances are shared by UserManager's profile cache:
+    treat them as read-only.
+    """
+
+    FIELDS = ("name", "age", "height_cm", "weight_kg", "skill_level", "playing_role", "weekly_days")
+    DERIVED = ("age_group", "bmi", "bmi_group")
+    __slots__ = FIELDS + DERIVED
+
     def __init__(self,name,age, height_cm, weight_kg, skill_level, playing_role, weekly_days=None):
         self.name = name
         self.age = age
@@ -15,6 +25,23 @@ class UserProfile:
         self.bmi = self._compute_bmi()
         self.bmi_group = self._compute_bmi_group()
 
+    @classmethod
+    def from_record(cls, record):
+        """Profile from a stored user record; derived fields are recomputed only if missing."""
+        if any(record.get(field) is None for field in cls.DERIVED):
+            return cls(
+                name=record.get("name"), age=record["age"], height_cm=record["height_cm"],
+                weight_kg=record["weight_kg"], skill_level=record["skill_level"],
+                playing_role=record["playing_role"], weekly_days=record.get("weekly_days")
+            )
+        profile = cls.__new__(cls)
+        for field in cls.FIELDS + cls.DERIVED:
+            setattr(profile, field, record.get(field))
+        return profile
+
+    def to_record(self):
+        return {field: getattr(self, field) for field in self.FIELDS + self.DERIVED}
+
     def _compute_age_group(self):
         if self.age <= 12:
             return "U13"
@@ -92,30 +119,36 @@ class UserProfile:
 
 
     @staticmethod
-    def validate_inputs(user_data):
-        base_path = os.path.dirname(os.path.dirname(__file__))
-        rules_path = os.path.join(base_path, "rules", "user_inputs.json")
-
-        with open(rules_path, "r", encoding="utf-8") as f:
-            rules = json.load(f)
-
-        # check required fields
-        for field in rules["required_fields"]:
-            if field not in user_data:
-                return False, f"Missing required field: {field}"
+    def normalise_input(user_data):
+        """
+        Copy of user_data with weekly_days (what the UI sends) and the rules'
+        weekly_training_days set to the same value, so the optional-field
+        check covers whichever key was used; weekly_days wins if both are given.
+        """
+        if not isinstance(user_data, dict):
+            return user_data
+        data = dict(user_data)
+        if "weekly_days" in data or "weekly_training_days" in data:
+            weekly_days = data.get("weekly_days", data.get("weekly_training_days"))
+            data["weekly_days"] = data["weekly_training_days"] = weekly_days
+        return data
+
+    @classmethod
+    def from_input(cls, user_data):
+        """Profile from registration input (see normalise_input for the weekly days keys)."""
+        weekly_days = user_data.get("weekly_days", user_data.get("weekly_training_days"))
+        return cls(
+            name=user_data.get("name"), age=user_data["age"], height_cm=user_data["height_cm"],
+            weight_kg=user_data["weight_kg"], skill_level=user_data["skill_level"],
+            playing_role=user_data["playing_role"], weekly_days=weekly_days
+        )
 
-        # value validation
-        for field, rule in rules["required_fields"].items():
-            val = user_data[field]
-
-            if rule["type"] == "int":
-                if not isinstance(val, int):
-                    return False, f"{field} must be an integer."
-                if val < rule["min"] or val > rule["max"]:
-                    return False, f"{field} outside valid range."
-
-            if rule["type"] == "choice":
-                if val not in rule["values"]:
-                    return False, f"{field} not in valid value list."
+    @staticmethod
+    def validate_inputs(user_data):
+        # rules/user_inputs.json compiled once (and hot-reloaded) by agent.input_validator
+        return get_validator().validate(UserProfile.normalise_input(user_data))
 
-        return True, "Valid Input"
+    @staticmethod
+    def validate_changes(changes):
+        """Like validate_inputs, but only for the fields being changed."""
+        return get_validator().validate_changes(UserProfile.normalise_input(changes))
@@ -0,0 +1,261 @@
+"""
+Typo-tolerant matching over the cricket domain vocabulary.
+
+    from agent.vocab_matcher import get_matcher
+    get_matcher().correct("improve powet hitting")   # -> "improve power hitting"
+    get_matcher().match("drils for foot wrk")        # -> {"phrase": "footwork", ...}
+    get_matcher().lookup("how to play pul shot", "shot")  # -> "PULL_SHOT"
+
+Words are corrected with a SymSpell-style delete index (Damerau/OSA
+distance <= 2) built from shot names, fundamentals and roadmap keywords,
+TechEngine.keyword_map, technical area names and ExerciseEngine.GOAL_MAP.
+Corrected text is then scanned for the longest known phrase. The engines'
+detectors fall back to lookup() when their exact substring match misses.
+
+Only unknown words are corrected: anything in data/english_words.txt, the
+vocabulary or COMMON_WORDS (or a plural / -ed / -ing form of one) is left
+as typed, and a replacement needs a clear distance or frequency margin
+over the runner-up.
+"""
+import json
+import os
+import threading
+from functools import lru_cache
+
+from .cache import normalize_text
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+WORDS_PATH = os.path.join(BASE_DIR, "data", "english_words.txt")
+
+# Ordinary words that must never be "corrected" into cricket terms
+COMMON_WORDS = {
+    "a", "an", "the", "is", "are", "was", "be", "of", "to", "in", "on", "for", "and", "or", "at",
+    "by", "as", "it", "with", "from", "that", "this", "my", "me", "i", "you", "your", "we", "our",
+    "how", "what", "who", "when", "where", "why", "which", "do", "does", "did", "can", "could",
+    "would", "should", "will", "want", "need", "give", "show", "tell", "teach", "help", "improve",
+    "better", "get", "some", "any", "about", "play", "playing", "drill", "drills", "practice",
+    "exercise", "exercises", "workout", "technique", "explain", "please", "hey", "hi", "hello",
+    "more", "best", "good", "make", "like", "need", "have", "has", "not", "no", "yes", "new",
+    "plan", "tips", "way", "ways", "start", "learn", "work", "gym", "rule", "rules", "law", "laws"
+}
+
+
+# (ending, replacement) pairs stripped to find the base of an inflected word
+SUFFIXES = (("ies", "y"), ("ied", "y"), ("es", ""), ("s", ""), ("ed", ""), ("ed", "e"), ("d", ""),
+            ("ing", ""), ("ing", "e"), ("ers", ""), ("er", ""), ("ly", ""))
+
+
+def stems(word):
+    """word plus every base it may be an inflection of: "pitched" -> {"pitched", "pitch", "pitche", ...}."""
+    found = {word}
+    for suffix, replacement in SUFFIXES:
+        if not word.endswith(suffix) or len(word) - len(suffix) < 3:
+            continue
+        base = word[:-len(suffix)] + replacement
+        if suffix in ("ing", "ed", "er", "ers") and not replacement:
+            if len(base) >= 4 and base[-1] == base[-2] and base[-1] not in "lsz":
+                base = base[:-1]    # "hitting" -> "hitt" -> "hit"
+            elif len(base) == 3 and base[0] not in "aeiou" and base[1] in "aeiou" and base[2] not in "aeiouwxy":
+                continue            # "hiting" is not "hit" + ing, which doubles the t
+        found.add(base)
+    return found
+
+
+def osa_distance(a, b, max_distance):
+    """Optimal-string-alignment distance, or max_distance + 1 once it is exceeded."""
+    if abs(len(a) - len(b)) > max_distance:
+        return max_distance + 1
+    previous2 = None
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        row_min = i
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            value = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                value = min(value, previous2[j - 2] + 1)
+            current[j] = value
+            row_min = min(row_min, value)
+        if row_min > max_distance:
+            return max_distance + 1
+        previous2, previous = previous, current
+    return previous[-1]
+
+
+def _deletes(word, depth):
+    """Every string reachable from word by deleting up to `depth` characters."""
+    found = {word}
+    frontier = {word}
+    for _ in range(depth):
+        frontier = {w[:i] + w[i + 1:] for w in frontier for i in range(len(w)) if len(w) > 1}
+        found |= frontier
+    return found
+
+
+def domain_terms():
+    """[(phrase, kind, target)] from the rule files and engine keyword maps."""
+    from .exercise_engine import ExerciseEngine
+    from .tech_engine import TechEngine
+
+    def load(*parts):
+        with open(os.path.join(BASE_DIR, *parts), "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    terms = []
+    for key, shot in load("rules", "shots.json").items():
+        terms.append((shot["name"], "shot", key))
+    for key, item in load("rules", "fundamentals.json").items():
+        terms.extend((kw, "fundamental", key) for kw in item.get("keywords", []))
+    for key, item in load("rules", "roadmap.json").items():
+        terms.extend((kw, "roadmap", key) for kw in item.get("trigger_keywords", []))
+
+    tech = TechEngine()
+    terms.extend((kw, "tech_category", cat_id) for kw, cat_id in tech.keyword_map.items())
+    for category in tech.categories:
+        terms.append((category["category_name"], "tech_category", category["category_id"]))
+        terms.extend((area["name"], "tech_area", area["area_id"]) for area in category["areas"])
+
+    terms.extend((kw, "exercise_goal", goal) for kw, goal in ExerciseEngine.GOAL_MAP.items())
+    return terms
+
+
+def english_words(path=WORDS_PATH):
+    """Correctly spelled words from data/english_words.txt (one per line, # comments)."""
+    with open(path, "r", encoding="utf-8") as f:
+        return {line.strip() for line in f if line.strip() and not line.startswith("#")}
+
+
+class VocabMatcher:
+    """
+    correct(text)  -> text with misspelt domain words fixed
+    match(text)    -> longest known phrase in the corrected text, or None
+    Single-word lookups are memoised, so repeat queries cost a dict hit.
+    """
+
+    def __init__(self, terms, max_distance=2, known_words=()):
+        self.max_distance = max_distance
+        # normalized phrase -> [(canonical text, kind, target), ...] in definition order
+        self.phrases = {}
+        self.words = {}   # vocabulary word -> frequency across phrases
+        for phrase, kind, target in terms:
+            key = normalize_text(phrase)
+            if not key:
+                continue
+            self.phrases.setdefault(key, []).append((phrase, kind, target))
+            for word in key.split():
+                self.words[word] = self.words.get(word, 0) + 1
+            # "foot work" / "footwork": index the joined form too
+            joined = key.replace(" ", "")
+            if " " in key and len(key.split()) == 2:
+                self.phrases.setdefault(joined, []).append((phrase, kind, target))
+                self.words[joined] = self.words.get(joined, 0) + 1
+
+        # words that are spelled right even though they are not domain terms
+        self.known = set(known_words) | COMMON_WORDS | set(self.words)
+        self._max_words = max((len(p.split()) for p in self.phrases), default=1)
+        self._index = {}
+        for word in self.words:
+            for variant in _deletes(word, self._depth(word)):
+                self._index.setdefault(variant, []).append(word)
+        self.correct_word = lru_cache(maxsize=8192)(self._correct_word)
+
+    def _depth(self, word):
+        # one edit for short words, two for longer ones
+        return 1 if len(word) <= 5 else self.max_distance
+
+    def _correct_word(self, word):
+        """
+        Returns (vocabulary word, distance), or (word, 0) if it is a known
+        word or an inflection of one, too far from the vocabulary, or too
+        close to call between two candidates.
+        """
+        if word in self.known or len(word) < 4 or word.isdigit():
+            return word, 0
+        bases = stems(word)
+        if bases & self.known:
+            return word, 0
+
+        depth = self._depth(word)
+        ranks = []
+        seen = set()
+        for variant in _deletes(word, depth):
+            for candidate in self._index.get(variant, ()):
+                if candidate in seen:
+                    continue
+                seen.add(candidate)
+                # "wicket" / "wickets": another form of the same word, not a typo of it
+                if stems(candidate) & bases:
+                    continue
+                limit = min(depth, self._depth(candidate))
+                distance = osa_distance(word, candidate, limit)
+                if distance <= limit:
+                    ranks.append((distance, -self.words[candidate], candidate))
+        if not ranks:
+            return word, 0
+
+        ranks.sort()
+        best = ranks[0]
+        if len(ranks) > 1:
+            runner_up = ranks[1]
+            # same distance: the winner must be at least twice as frequent
+            if runner_up[0] == best[0] and -best[1] < 2 * -runner_up[1]:
+                return word, 0
+        return best[2], best[0]
+
+    def correct(self, text):
+        """Normalizes text and fixes each misspelt domain word."""
+        words = normalize_text(text).split()
+        corrected = [self.correct_word(w)[0] for w in words]
+
+        # words the user broke apart ("foot wrk" -> "footwork")
+        merged = []
+        i = 0
+        while i < len(words):
+            if i + 1 < len(words) and not (words[i] in self.words and words[i + 1] in self.words):
+                fixed, distance = self.correct_word(words[i] + words[i + 1])
+                if distance <= 1 and fixed in self.phrases:
+                    merged.append(normalize_text(self.phrases[fixed][0][0]))
+                    i += 2
+                    continue
+            merged.append(corrected[i])
+            i += 1
+        return " ".join(merged)
+
+    def match(self, text, kinds=None):
+        """
+        Longest known phrase in the corrected text, optionally limited to
+        some kinds ("shot", "fundamental", "roadmap", "tech_category",
+        "tech_area", "exercise_goal"):
+        {"phrase", "kind", "target", "corrected"} or None.
+        """
+        corrected = self.correct(text)
+        words = corrected.split()
+        for size in range(min(self._max_words, len(words)), 0, -1):
+            for i in range(len(words) - size + 1):
+                key = " ".join(words[i:i + size])
+                if key in COMMON_WORDS:
+                    continue
+                for phrase, kind, target in self.phrases.get(key, ()):
+                    if kinds is None or kind in kinds:
+                        return {"phrase": phrase.lower(), "kind": kind, "target": target, "corrected": corrected}
+        return None
+
+    def lookup(self, text, kind):
+        """Target of the best `kind` phrase in text (e.g. a shot key), or None."""
+        found = self.match(text, kinds=(kind,))
+        return found["target"] if found else None
+
+
+_matcher = None
+_matcher_lock = threading.Lock()
+
+
+def get_matcher():
+    """Process-wide VocabMatcher, built on first use (~tens of ms)."""
+    global _matcher
+    if _matcher is None:
+        with _matcher_lock:
+            if _matcher is None:
+                _matcher = VocabMatcher(domain_terms(), known_words=english_words())
+    return _matcher
@@ -1,36 +1,123 @@
-from flask import Flask, request, jsonify, render_template
+import csv
+import io
+import json
+import os
+import time
+from flask import Flask, Response, g, request, jsonify, render_template, stream_with_context
 from flask_cors import CORS
 
 # Core imports
 from agent.inference import CricketInferenceEngine
-from agent.user_manager import UserManager
+from agent.user_manager import UserManager, parse_csv, parse_ndjson
 from agent.user_profile import UserProfile
 from agent.exercise_engine import ExerciseEngine
 from agent.tech_engine import TechEngine
 from agent.conversation_router import ConversationRouter
+from agent.tracing import tracer
+from rag_engine import RagEngine
 
 # Flask app
 app = Flask(__name__)
 CORS(app) # Allow the Frontend to talk to us
 
-# Single instances
-print("🚀 Starting CrickMate AI Engines...")
-engine = CricketInferenceEngine()
-user_manager = UserManager()
-exercise_engine = ExerciseEngine()
-tech_engine = TechEngine()
+# Single instances. The RAG extraction workers (RAG_WORKERS > 1) re-import this
+# file as __mp_main__ when started with `python app.py`; they only need rag_extract.
+if __name__ != "__mp_main__":
+    print("🚀 Starting CrickMate AI Engines...")
+    engine = CricketInferenceEngine()
+    user_manager = UserManager()
+    exercise_engine = ExerciseEngine()
+    tech_engine = TechEngine()
 
-# INITIALIZE ROUTER (With RAG support if you have the file)
-# If this fails, make sure conversation_router.py is also updated!
-router = ConversationRouter(engine, tech_engine, exercise_engine)
+    # RAG library indexes on a background thread; /api/status reports progress
+    rag_engine = RagEngine(background=True)
+    # Hot reload of knowledge_base: poll every RAG_WATCH_INTERVAL seconds (0 = off)
+    if float(os.getenv("RAG_WATCH_INTERVAL", "0")) > 0:
+        rag_engine.watch()
+
+    # INITIALIZE ROUTER (With RAG support if you have the file)
+    # If this fails, make sure conversation_router.py is also updated!
+    router = ConversationRouter(engine, tech_engine, exercise_engine)
+    router.rag = rag_engine
+
+    print("✅ Engines Online!")
+
+# --- TRACING: per-request spans -> Server-Timing (debug / TRACING_HEADER=1) ---
+SERVER_TIMING_HEADER = os.getenv("TRACING_HEADER", "0") == "1"
+
+
+@app.before_request
+def start_trace():
+    tracer.start()
+    g.trace_started = time.perf_counter()
+
+
+@app.after_request
+def finish_trace(response):
+    spans = tracer.finish()
+    if tracer.enabled and request.endpoint and "trace_started" in g:
+        total_ms = (time.perf_counter() - g.trace_started) * 1000
+        if response.is_streamed:
+            # The body has not run yet: the header only covers time to headers,
+            # traced_stream records request.<endpoint> once the stream ends
+            spans.append(("headers", total_ms))
+        else:
+            tracer.record(f"request.{request.endpoint}", total_ms)
+            spans.append(("total", total_ms))
+        if app.debug or SERVER_TIMING_HEADER:
+            response.headers["Server-Timing"] = tracer.server_timing(spans)
+    return response
+
+
+def traced_stream(chunks):
+    """
+    Iterates a streamed body under its own request trace (wrap it in
+    stream_with_context), so request.<endpoint> measures the whole stream
+    rather than time to headers. The headers are long gone by then, so the
+    stream's spans are printed instead of sent as Server-Timing.
+    """
+    tracer.start()
+    try:
+        yield from chunks
+    finally:
+        spans = tracer.finish()
+        if tracer.enabled and request.endpoint and "trace_started" in g:
+            total_ms = (time.perf_counter() - g.trace_started) * 1000
+            tracer.record(f"request.{request.endpoint}", total_ms)
+            spans.append(("total", total_ms))
+            if app.debug or SERVER_TIMING_HEADER:
+                print(f"[TRACE] {request.endpoint}: {tracer.server_timing(spans)}")
 
-print("✅ Engines Online!")
 
 @app.route("/", methods=["GET"])
 def home():
     return render_template("index.html")
 
 
+@app.route("/api/status", methods=["GET"])
+def status():
+    rag_status = rag_engine.status()
+    return jsonify({
+        "status": "ok",
+        "ready": rag_status["ready"],
+        "rag": rag_status,
+        "answer_cache": router.answer_cache.stats(),
+        "intent": router.intent_agent.status(),
+        "summary_llm": router.summary_llm.stats(),
+        "sessions": router.sessions.stats(),
+        "users": user_manager.stats(),
+        "speculation": router.speculation_stats()
+    })
+
+
+@app.route("/api/metrics", methods=["GET"])
+def metrics():
+    """Span latency histograms; ?format=prometheus for the text exposition format."""
+    if request.args.get("format") == "prometheus":
+        return Response(tracer.prometheus(), mimetype="text/plain; version=0.0.4")
+    return jsonify({"tracing": tracer.enabled, "spans": tracer.snapshot()})
+
+
 # --- OLD ENDPOINTS (For Postman) ---
 @app.route("/api/recommend-training", methods=["POST"])
 def recommend_training():
@@ -56,18 +143,55 @@ def get_user(user_id):
     if not success: return jsonify({"status": "error", "message": info}), 404
     return jsonify({"status": "success", "profile": info})
 
+@app.route("/api/update-user/<user_id>", methods=["POST"])
+def update_user(user_id):
+    """Changes only the fields sent; the cached UserProfile is replaced on the next lookup."""
+    changes = request.get_json()
+    success, info = user_manager.update_user(user_id, changes)
+    if not success: return jsonify({"status": "error", "message": info}), 404 if info == "User not found" else 400
+    return jsonify({"status": "success", "profile": info})
+
+@app.route("/api/import-users", methods=["POST"])
+def import_users():
+    """Bulk registration: NDJSON (default) or CSV (?format=csv or a text/csv body), read as it streams in."""
+    fmt = request.args.get("format") or ("csv" if "csv" in (request.content_type or "") else "ndjson")
+    if fmt not in ("csv", "ndjson"):
+        return jsonify({"status": "error", "message": "format must be 'ndjson' or 'csv'"}), 400
+    # utf-8-sig: Excel starts its CSV exports with a byte-order mark
+    lines = io.TextIOWrapper(request.stream, encoding="utf-8-sig", newline="")
+    rows = parse_csv(lines) if fmt == "csv" else parse_ndjson(lines)
+    try:
+        report = user_manager.import_users(rows)
+    except UnicodeDecodeError:
+        return jsonify({"status": "error", "message": "Body must be UTF-8 text"}), 400
+    except csv.Error as e:
+        # NUL bytes, oversized fields, ...: nothing was written, the import runs in one transaction
+        return jsonify({"status": "error", "message": f"Malformed CSV: {e}"}), 400
+    status = "success" if not report["failed"] else ("partial" if report["imported"] else "error")
+    return jsonify({"status": status, **report}), 200 if report["imported"] or not report["failed"] else 400
+
+@app.route("/api/export-users", methods=["GET"])
+def export_users():
+    """Every profile as NDJSON, streamed page by page (?page_size=500, ?after=USER0100 to resume)."""
+    page_size = max(1, min(request.args.get("page_size", 500, type=int), 5000))
+    after = request.args.get("after")
+    try:
+        records = user_manager.iter_users(page_size=page_size, after=after)
+    except KeyError:
+        # an empty body would look like a finished export
+        return jsonify({"status": "error", "message": f"Unknown cursor: no user {after}"}), 400
+    return Response(
+        stream_with_context(traced_stream(json.dumps(r) + "\n" for r in records)),
+        mimetype="application/x-ndjson"
+    )
+
 @app.route("/api/get-batting-exercises", methods=["POST"])
 def get_batting_exercises():
     data = request.get_json()
     user_id = data["user_id"]
     goal = data["goal"]
-    success, user_dict = user_manager.get_user(user_id)
-    if not success: return jsonify({"error": "User not found"}), 404
-    user = UserProfile(
-        age=user_dict["age"], height_cm=user_dict["height_cm"], weight_kg=user_dict["weight_kg"],
-        skill_level=user_dict["skill_level"], playing_role=user_dict["playing_role"],
-        weekly_days=user_dict.get("weekly_training_days", None)
-    )
+    user = user_manager.get_profile(user_id)
+    if user is None: return jsonify({"error": "User not found"}), 404
     result = exercise_engine.get_batting_exercises(user, goal)
     return jsonify(result), 200
 
@@ -76,13 +200,8 @@ def get_exercise_details():
     data = request.get_json()
     user_id = data["user_id"]
     exercise_name = data["exercise_name"]
-    success, user_dict = user_manager.get_user(user_id)
-    if not success: return jsonify({"error": "User not found"}), 404
-    user = UserProfile(
-        age=user_dict["age"], height_cm=user_dict["height_cm"], weight_kg=user_dict["weight_kg"],
-        skill_level=user_dict["skill_level"], playing_role=user_dict["playing_role"],
-        weekly_days=user_dict.get("weekly_training_days", None)
-    )
+    user = user_manager.get_profile(user_id)
+    if user is None: return jsonify({"error": "User not found"}), 404
     result = exercise_engine.get_exercise_details(user, exercise_name)
     return jsonify(result), 200
 
@@ -90,13 +209,8 @@ def get_exercise_details():
 def get_technical_drills():
     data = request.get_json()
     user_id = data["user_id"]
-    success, user_dict = user_manager.get_user(user_id)
-    if not success: return jsonify({"error": "User not found"}), 404
-    user = UserProfile(
-        age=user_dict["age"], height_cm=user_dict["height_cm"], weight_kg=user_dict["weight_kg"],
-        skill_level=user_dict["skill_level"], playing_role=user_dict["playing_role"],
-        weekly_days=user_dict.get("weekly_training_days", None)
-    )
+    user = user_manager.get_profile(user_id)
+    if user is None: return jsonify({"error": "User not found"}), 404
     result = tech_engine.recommend_technical_areas(user)
     return jsonify(result), 200
 
@@ -105,8 +219,7 @@ def ask_technical():
     data = request.get_json()
     user_id = data["user_id"]
     question = data["question"].lower()
-    success, user_dict = user_manager.get_user(user_id)
-    if not success: return jsonify({"error": "User not found"}), 404
+    if user_manager.get_profile(user_id) is None: return jsonify({"error": "User not found"}), 404
     area = tech_engine.search_area_by_query(question)
     if not area: return jsonify({"response": "Sorry, I couldn't match that to a technical area."})
     result = tech_engine.format_area_output(area)
@@ -123,27 +236,55 @@ def chat():
     
     # 2. Default User (If frontend doesn't send ID)
     user_id = data.get("user_id", "GUEST_WEB")
-    
-    # 3. Create a Guest User if ID not found
-    success, user_dict = user_manager.get_user(user_id)
-    if not success:
-        # Create a temp profile for the guest
-        user = UserProfile(
-            name="Guest", age=20, height_cm=180, weight_kg=75,
-            skill_level="Intermediate", playing_role="Top Order Batsman"
-        )
-    else:
-        user = UserProfile(
-            name=user_dict["name"], age=user_dict["age"], height_cm=user_dict["height_cm"],
-            weight_kg=user_dict["weight_kg"], skill_level=user_dict["skill_level"],
-            playing_role=user_dict["playing_role"],
-        )
-
-    # 4. Process Message
+    with tracer.span("user_lookup"):
+        user = chat_user(user_id)
+
+    # 3. Process Message
     text = data["message"]
     response = router.process(user_id, user, text)
 
     return jsonify(response), 200
 
+
+# --- STREAMING CHAT (Server-Sent Events) ---
+@app.route("/api/chat/stream", methods=["POST"])
+def chat_stream():
+    data = request.get_json()
+    if not data or "message" not in data:
+        return jsonify({"error": "message required"}), 400
+
+    user_id = data.get("user_id", "GUEST_WEB")
+    with tracer.span("user_lookup"):
+        user = chat_user(user_id)
+    text = data["message"]
+
+    def events():
+        # event: intent | sources | token | done  (done carries the /api/chat payload)
+        # A failure mid-stream ends with an "error" event instead of a silent close
+        try:
+            for event, payload in router.process_stream(user_id, user, text):
+                yield f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+        except Exception as e:
+            print(f"[ERROR] Chat stream failed: {e!r}")
+            yield f"event: error\ndata: {json.dumps({'error': 'Something went wrong while answering. Please try again.'})}\n\n"
+
+    return Response(
+        stream_with_context(traced_stream(events())),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+# Temp profile for chat users who never registered (read-only, shared)
+GUEST_PROFILE = UserProfile(
+    name="Guest", age=20, height_cm=180, weight_kg=75,
+    skill_level="Intermediate", playing_role="Top Order Batsman"
+)
+
+
+def chat_user(user_id):
+    """The registered profile for user_id, or the Guest profile if not found."""
+    return user_manager.get_profile(user_id) or GUEST_PROFILE
+
 if __name__ == "__main__":
     app.run(debug=True)
\ No newline at end of file
@@ -0,0 +1,94 @@
+"""
+Offline load test of the /api/chat pipeline.
+
+    LLM_BACKEND=record python bench_chat.py --record      # one live pass to fill the cassette
+    LLM_BACKEND=replay LLM_REPLAY_LATENCY_MS=recorded python bench_chat.py --threads 8 --requests 400
+
+Messages come from rules/intent_examples.json (or --messages, one per
+line). Requests go through Flask's test client, so no server is needed;
+with LLM_BACKEND=replay no API key or network is needed either. Prints
+throughput and latency percentiles as JSON.
+"""
+import argparse
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from bench_util import percentile
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+EXAMPLES_PATH = os.path.join(BASE_DIR, "rules", "intent_examples.json")
+
+
+def load_messages(path):
+    if path:
+        with open(path, "r", encoding="utf-8") as f:
+            return [line.strip() for line in f if line.strip()]
+    with open(EXAMPLES_PATH, "r", encoding="utf-8") as f:
+        return [e["message"] for e in json.load(f)["examples"]]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test /api/chat in-process.")
+    parser.add_argument("--messages", default=None, help="file with one chat message per line")
+    parser.add_argument("--threads", type=int, default=4, help="concurrent clients")
+    parser.add_argument("--requests", type=int, default=200, help="total requests")
+    parser.add_argument("--record", action="store_true", help="send each message once, in order (fills the cassette)")
+    args = parser.parse_args()
+
+    # The answer / intent caches would hide the LLM path after the first pass
+    os.environ.setdefault("INTENT_CACHE", "0")
+    os.environ.setdefault("INTENT_LOG", "0")
+    os.environ.setdefault("ANSWER_CACHE_SIZE", "0")
+
+    import app as chat_app
+
+    chat_app.rag_engine.wait_ready()
+    messages = load_messages(args.messages)
+    if args.record:
+        jobs = messages
+        args.threads = 1
+    else:
+        jobs = [messages[i % len(messages)] for i in range(args.requests)]
+
+    local = threading.local()
+    samples = []
+    errors = []
+    lock = threading.Lock()
+
+    def send(index, message):
+        client = getattr(local, "client", None)
+        if client is None:
+            client = local.client = chat_app.app.test_client()
+        started = time.perf_counter()
+        response = client.post("/api/chat", json={"user_id": f"BENCH_{index % args.threads}", "message": message})
+        elapsed = (time.perf_counter() - started) * 1000
+        with lock:
+            samples.append(elapsed)
+            if response.status_code != 200:
+                errors.append(response.status_code)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.threads) as pool:
+        list(pool.map(lambda job: send(*job), enumerate(jobs)))
+    wall = time.perf_counter() - started
+
+    report = {
+        "backend": os.getenv("LLM_BACKEND", "live"),
+        "threads": args.threads,
+        "requests": len(samples),
+        "errors": len(errors),
+        "wall_s": round(wall, 3),
+        "throughput_rps": round(len(samples) / wall, 1) if wall else None,
+        "p50_ms": percentile(samples, 50),
+        "p90_ms": percentile(samples, 90),
+        "p99_ms": percentile(samples, 99),
+        "intent": chat_app.router.intent_agent.status()["tiers"]
+    }
+    print(json.dumps(report, indent=4))
+
+
+if __name__ == "__main__":
+    main()
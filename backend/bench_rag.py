@@ -0,0 +1,191 @@
+"""
+RAG retrieval benchmark and recall suite.
+
+    python bench_rag.py                       # 1x,10x,100x synthetic corpora, every available mode
+    python bench_rag.py --scales 1,10 --modes bm25 --out bench_rag.json
+
+For each synthetic corpus size and retrieval mode it times the index build
+(empty cache), a cold start (new engine over a warm cache) and per-query
+p50/p99. Recall@k is measured on the real knowledge_base against the
+labelled questions in data/rag_eval.json. The report is printed as JSON.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import tempfile
+import time
+
+import rag_vectors
+from bench_util import percentile
+from rag_engine import RETRIEVAL_MODES, RagEngine
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+EVAL_PATH = os.path.join(BASE_DIR, "data", "rag_eval.json")
+
+# Used when the real knowledge_base has no extractable text (e.g. LFS pointers)
+FALLBACK_KB_CHARS = 2_000_000
+FALLBACK_VOCAB = (
+    "bat ball bowler batter striker umpire wicket stumps crease over run runs boundary "
+    "fielder fielders circle powerplay wide no lbw leg before caught stumped keeper "
+    "innings match law penalty appeal dismissal delivery pitch seam spin pace review"
+).split()
+BOOK_CHARS = 200_000
+
+
+def quiet(fn, *args, **kwargs):
+    """Runs fn with the engine's progress prints suppressed; returns (result, elapsed_ms)."""
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        result = fn(*args, **kwargs)
+    return result, round((time.perf_counter() - started) * 1000, 1)
+
+
+def available_modes(requested):
+    dense_ok = True
+    if any(mode != "bm25" for mode in requested):
+        try:
+            rag_vectors._import_backend()
+        except ImportError:
+            dense_ok = False
+
+    modes = []
+    for mode in requested:
+        if mode != "bm25" and not dense_ok:
+            print(f"[BENCH] skipping {mode}: sentence-transformers / faiss-cpu not installed")
+            continue
+        modes.append(mode)
+    return modes
+
+
+def write_synthetic_corpus(folder, total_chars, vocab, weights, seed=7):
+    """Writes ~total_chars of paragraph text as BOOK_CHARS-sized .txt books."""
+    rng = random.Random(seed)
+    written = 0
+    book = 0
+    while written < total_chars:
+        size = min(BOOK_CHARS, total_chars - written)
+        paragraphs = []
+        length = 0
+        while length < size:
+            words = rng.choices(vocab, weights=weights, k=rng.randint(60, 120))
+            paragraph = " ".join(words).capitalize() + "."
+            paragraphs.append(paragraph)
+            length += len(paragraph) + 2
+        with open(os.path.join(folder, f"synthetic_{book:04d}.txt"), "w", encoding="utf-8") as f:
+            f.write("\n\n".join(paragraphs))
+        written += length
+        book += 1
+    return book
+
+
+def time_queries(engine, queries, repeat):
+    samples = []
+    for _ in range(repeat):
+        for query in queries:
+            started = time.perf_counter()
+            engine.search(query)
+            samples.append((time.perf_counter() - started) * 1000)
+    return {
+        "queries": len(samples),
+        "query_p50_ms": percentile(samples, 50),
+        "query_p99_ms": percentile(samples, 99)
+    }
+
+
+def bench_scale(scale, kb_chars, vocab, weights, modes, queries, repeat, workers):
+    with tempfile.TemporaryDirectory(prefix=f"rag_bench_{scale}x_") as folder:
+        books, gen_ms = quiet(write_synthetic_corpus, folder, kb_chars * scale, vocab, weights)
+        report = {"scale": scale, "chars": kb_chars * scale, "books": books, "generate_ms": gen_ms, "modes": {}}
+        print(f"[BENCH] {scale}x: {books} books, {kb_chars * scale / 1e6:.1f}M chars")
+
+        for mode in modes:
+            # build: nothing cached yet for this mode; cold start: fresh engine, warm cache
+            for name in ("corpus.bin", "vectors.faiss", "vectors.json"):
+                path = os.path.join(folder, ".cache", name)
+                if os.path.exists(path):
+                    os.remove(path)
+            _, build_ms = quiet(RagEngine, kb_path=folder, mode=mode, workers=workers)
+            engine, cold_ms = quiet(RagEngine, kb_path=folder, mode=mode, workers=workers)
+            stats = time_queries(engine, queries, repeat)
+            report["modes"][mode] = dict(stats, build_ms=build_ms, cold_start_ms=cold_ms,
+                                         chunks=engine.index.chunk_count)
+            print(f"[BENCH]   {mode}: build {build_ms} ms, cold {cold_ms} ms, "
+                  f"p50 {stats['query_p50_ms']} ms, p99 {stats['query_p99_ms']} ms")
+        return report
+
+
+def recall_at_k(engine, questions, ks):
+    hits = {k: 0 for k in ks}
+    for item in questions:
+        results = engine.search(item["question"], top_k=max(ks))
+        for k in ks:
+            for r in results[:k]:
+                text = r["text"].lower()
+                if r["source"] in item["sources"] and any(t in text for t in item["answer_terms"]):
+                    hits[k] += 1
+                    break
+    return {f"recall@{k}": round(hits[k] / len(questions), 4) for k in ks}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark RagEngine latency and recall.")
+    parser.add_argument("--scales", default="1,10,100", help="synthetic corpus sizes as multiples of knowledge_base")
+    parser.add_argument("--modes", default=",".join(RETRIEVAL_MODES), help="retrieval modes to benchmark")
+    parser.add_argument("--repeat", type=int, default=5, help="passes over the question set per mode")
+    parser.add_argument("--workers", type=int, default=1, help="RAG_WORKERS for extraction")
+    parser.add_argument("--ks", default="1,3,5", help="k values for recall@k")
+    parser.add_argument("--out", default=None, help="write the JSON report here as well as stdout")
+    args = parser.parse_args()
+
+    with open(EVAL_PATH, "r", encoding="utf-8") as f:
+        questions = json.load(f)["questions"]
+    queries = [q["question"] for q in questions]
+    modes = available_modes(args.modes.split(","))
+    ks = [int(k) for k in args.ks.split(",")]
+
+    # The real library: recall set, size reference and vocabulary for the synthetic books
+    real, real_ms = quiet(RagEngine, mode="bm25", workers=args.workers)
+    corpus = real.corpus
+    kb_chars = sum(len(corpus.book_text(s)) for s in corpus.sources) if corpus else 0
+    if kb_chars:
+        vocab = list(real.index.df)
+        weights = [real.index.df[t] for t in vocab]
+    else:
+        print("[BENCH] knowledge_base has no extractable text; using fallback size and vocabulary")
+        kb_chars = FALLBACK_KB_CHARS
+        vocab = FALLBACK_VOCAB
+        weights = [1] * len(vocab)
+
+    report = {
+        "generated_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "kb_books": len(corpus.sources) if corpus else 0,
+        "kb_chars": kb_chars,
+        "kb_load_ms": real_ms,
+        "scales": [],
+        "recall": {}
+    }
+
+    for scale in (int(s) for s in args.scales.split(",")):
+        report["scales"].append(
+            bench_scale(scale, kb_chars, vocab, weights, modes, queries, args.repeat, args.workers)
+        )
+
+    for mode in modes:
+        if not report["kb_books"]:
+            report["recall"][mode] = {"skipped": "knowledge_base has no extractable text"}
+            continue
+        engine, _ = quiet(RagEngine, mode=mode, workers=args.workers)
+        report["recall"][mode] = dict(recall_at_k(engine, questions, ks), questions=len(questions))
+
+    output = json.dumps(report, indent=4)
+    print(output)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,210 @@
+"""
+User store benchmark: legacy JSON file vs the SQLite-backed UserManager.
+
+    python bench_users.py                         # 100, 1k, 10k, 100k users
+    python bench_users.py --sizes 1000,50000 --lookups 500 --sync normal
+    python bench_users.py --sizes 1000 --workers 8    # + concurrent registration from 8 processes
+    python bench_users.py --sizes 100 --import-rows 10000   # + bulk NDJSON import vs one-by-one
+
+For each roster size a synthetic user_profiles.json is written to a temp
+directory. The legacy path (json.load of the whole file, then a linear
+scan, which is what get_user used to do) is timed against
+UserManager.get_user after the one-shot migration. Registration is timed
+the same way: legacy load-append-rewrite vs UserManager.register_user.
+With --workers, several processes register into one store at once and
+the allocated IDs are checked for duplicates. With --import-rows, a squad
+is ingested through import_users (the /api/import-users path) and through
+that many register_user calls. The report is printed as JSON.
+"""
+import argparse
+import contextlib
+import io
+import json
+import multiprocessing
+import os
+import random
+import tempfile
+import time
+
+from agent.user_manager import UserManager, parse_ndjson
+from bench_util import percentile
+
+ROLES = ["top order batsman", "middle order batsman", "wicket keeper batsman", "all rounder"]
+LEVELS = ["beginner", "intermediate", "advanced"]
+NEW_USER = {"name": "Bench", "age": 15, "height_cm": 160, "weight_kg": 50,
+            "skill_level": "beginner", "playing_role": "top order batsman"}
+
+
+def synthetic_users(count, rng):
+    users = []
+    for i in range(1, count + 1):
+        age = rng.randint(9, 35)
+        users.append({
+            "user_id": "USER" + str(i).zfill(4),
+            "name": f"Player {i}",
+            "age": age,
+            "height_cm": rng.randint(130, 195),
+            "weight_kg": rng.randint(30, 95),
+            "age_group": "Adult" if age > 18 else "U19",
+            "bmi": round(rng.uniform(15, 30), 2),
+            "bmi_group": "Athletic Ideal",
+            "skill_level": rng.choice(LEVELS),
+            "playing_role": rng.choice(ROLES),
+            "weekly_days": rng.randint(1, 6)
+        })
+    return users
+
+
+def legacy_get_user(path, user_id):
+    with open(path, "r") as f:
+        users = json.load(f)["users"]
+    for u in users:
+        if u["user_id"] == user_id:
+            return True, u
+    return False, "User not found"
+
+
+def legacy_register_user(path, record):
+    with open(path, "r") as f:
+        users = json.load(f)
+    record = {"user_id": "USER" + str(len(users["users"]) + 1).zfill(4), **record}
+    users["users"].append(record)
+    with open(path, "w") as f:
+        json.dump(users, f, indent=4)
+    return True, record["user_id"]
+
+
+def timed(fn, ids):
+    samples = []
+    for user_id in ids:
+        started = time.perf_counter()
+        found, _ = fn(user_id)
+        samples.append((time.perf_counter() - started) * 1000)
+        assert found, user_id
+    return {"p50_ms": percentile(samples, 50), "p99_ms": percentile(samples, 99)}
+
+
+def timed_calls(fn, calls):
+    samples = []
+    for _ in range(calls):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return {"p50_ms": percentile(samples, 50), "p99_ms": percentile(samples, 99)}
+
+
+def bench_size(count, lookups, registrations, sync, rng, tmp):
+    users = synthetic_users(count, rng)
+    profiles = os.path.join(tmp, f"profiles_{count}.json")
+    with open(profiles, "w") as f:
+        json.dump({"users": users}, f, indent=4)
+    ids = [rng.choice(users)["user_id"] for _ in range(lookups)]
+
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        manager = UserManager(db_path=os.path.join(tmp, f"users_{count}.sqlite3"), profile_path=profiles, sync=sync)
+    migrate_ms = (time.perf_counter() - started) * 1000
+
+    # the legacy path re-parses the whole file per call, so it gets fewer samples
+    legacy_ids = ids[:max(5, min(lookups, 2_000_000 // count))]
+    legacy_calls = max(3, min(registrations, 200_000 // count))
+    report = {
+        "users": count,
+        "json_bytes": os.path.getsize(profiles),
+        "migrate_ms": round(migrate_ms, 3),
+        "lookup": {
+            "legacy_json_scan": timed(lambda uid: legacy_get_user(profiles, uid), legacy_ids),
+            "sqlite": timed(manager.get_user, ids)
+        },
+        "register": {
+            "legacy_json_rewrite": timed_calls(lambda: legacy_register_user(profiles, NEW_USER), legacy_calls),
+            "sqlite": timed_calls(lambda: manager.register_user(dict(NEW_USER)), registrations)
+        }
+    }
+    manager.close()
+    return report
+
+
+def _register_worker(db_path, calls, sync, queue):
+    with contextlib.redirect_stdout(io.StringIO()):
+        manager = UserManager(db_path=db_path, profile_path=os.path.join(os.path.dirname(db_path), "no_profiles.json"), sync=sync, checkpoint_seconds=0)
+    queue.put([manager.register_user(dict(NEW_USER))[1] for _ in range(calls)])
+
+
+def bench_concurrent(workers, calls, sync, tmp):
+    """Registers from several processes at once; every allocated ID must be unique."""
+    db_path = os.path.join(tmp, "users_concurrent.sqlite3")
+    with contextlib.redirect_stdout(io.StringIO()):
+        UserManager(db_path=db_path, profile_path=os.path.join(os.path.dirname(db_path), "no_profiles.json"), sync=sync, checkpoint_seconds=0)
+    queue = multiprocessing.Queue()
+    procs = [multiprocessing.Process(target=_register_worker, args=(db_path, calls, sync, queue))
+             for _ in range(workers)]
+    started = time.perf_counter()
+    for p in procs:
+        p.start()
+    ids = [user_id for _ in procs for user_id in queue.get()]
+    for p in procs:
+        p.join()
+    wall = time.perf_counter() - started
+    return {
+        "workers": workers,
+        "registrations": len(ids),
+        "duplicate_ids": len(ids) - len(set(ids)),
+        "throughput_rps": round(len(ids) / wall, 1)
+    }
+
+
+def bench_import(rows, sync, rng, tmp):
+    """One bulk NDJSON import vs the same squad registered one call at a time."""
+    squad = []
+    for user in synthetic_users(rows, rng):
+        squad.append({k: user[k] for k in ("name", "age", "skill_level", "playing_role", "weekly_days")})
+        squad[-1].update(height_cm=rng.randint(120, 200), weight_kg=rng.randint(25, 100))
+    lines = [json.dumps(u) for u in squad]
+    missing = os.path.join(tmp, "no_profiles.json")
+    report = {"rows": rows}
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        manager = UserManager(db_path=os.path.join(tmp, "users_import.sqlite3"), profile_path=missing, sync=sync)
+        started = time.perf_counter()
+        result = manager.import_users(parse_ndjson(lines))
+        report["bulk_import_s"] = round(time.perf_counter() - started, 3)
+        report["imported"] = result["imported"]
+        manager.close()
+
+        manager = UserManager(db_path=os.path.join(tmp, "users_one_by_one.sqlite3"), profile_path=missing, sync=sync)
+        started = time.perf_counter()
+        for user in squad:
+            manager.register_user(dict(user))
+        report["one_by_one_s"] = round(time.perf_counter() - started, 3)
+        manager.close()
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark user lookups and registration as the roster grows.")
+    parser.add_argument("--sizes", default="100,1000,10000,100000", help="comma-separated user counts")
+    parser.add_argument("--lookups", type=int, default=1000, help="get_user calls per size")
+    parser.add_argument("--registrations", type=int, default=200, help="register_user calls per size")
+    parser.add_argument("--sync", default="full", help="USER_SYNC policy: off, normal, full")
+    parser.add_argument("--workers", type=int, default=0, help="processes for the concurrent registration check")
+    parser.add_argument("--import-rows", type=int, default=0, help="squad size for the bulk import comparison")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    with tempfile.TemporaryDirectory() as tmp:
+        report = {
+            "sync": args.sync,
+            "sizes": [bench_size(int(n), args.lookups, args.registrations, args.sync, rng, tmp)
+                      for n in args.sizes.split(",")]
+        }
+        if args.workers:
+            report["concurrent"] = bench_concurrent(args.workers, args.registrations, args.sync, tmp)
+        if args.import_rows:
+            report["import"] = bench_import(args.import_rows, args.sync, rng, tmp)
+    print(json.dumps(report, indent=4))
+
+
+if __name__ == "__main__":
+    main()
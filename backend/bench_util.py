@@ -0,0 +1,9 @@
+"""Helpers shared by the bench_*.py scripts; keep this free of heavy imports."""
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    if not ordered:
+        return None
+    rank = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered) + 0.5) - 1))
+    return round(ordered[rank], 3)
@@ -0,0 +1,120 @@
+"""
+Registration validation throughput: the old per-call rules file read vs
+agent.input_validator.
+
+    python bench_validator.py                    # 20k records, 20% invalid
+    python bench_validator.py --records 100000 --invalid 0.5
+
+Records are generated from rules/user_inputs.json itself. The legacy path
+(open + json.load of the rules file, then a walk over the rule dict, which
+is what UserProfile.validate_inputs used to do) is timed against
+InputValidator.validate and validate_many. Both must agree on every record
+the legacy path understood. The report is printed as JSON.
+"""
+import argparse
+import json
+import random
+import time
+
+from agent.input_validator import RULES_PATH, InputValidator
+
+
+def legacy_validate(user_data):
+    with open(RULES_PATH, "r", encoding="utf-8") as f:
+        rules = json.load(f)
+
+    for field in rules["required_fields"]:
+        if field not in user_data:
+            return False, f"Missing required field: {field}"
+
+    for field, rule in rules["required_fields"].items():
+        val = user_data[field]
+        if rule["type"] == "int":
+            if not isinstance(val, int):
+                return False, f"{field} must be an integer."
+            if val < rule["min"] or val > rule["max"]:
+                return False, f"{field} outside valid range."
+        if rule["type"] == "choice":
+            if val not in rule["values"]:
+                return False, f"{field} not in valid value list."
+
+    return True, "Valid Input"
+
+
+def make_records(count, invalid, rng):
+    with open(RULES_PATH, "r", encoding="utf-8") as f:
+        required = json.load(f)["required_fields"]
+
+    records = []
+    for i in range(count):
+        record = {}
+        for field, rule in required.items():
+            if rule["type"] == "int":
+                record[field] = rng.randint(rule["min"], rule["max"])
+            elif rule["type"] == "choice":
+                record[field] = rng.choice(rule["values"])
+            else:
+                record[field] = f"Player {i}"
+        if rng.random() < invalid:
+            field = rng.choice(list(required))
+            breakage = rng.choice(("missing", "range", "type", "choice"))
+            if breakage == "missing":
+                del record[field]
+            elif breakage == "range" and required[field]["type"] == "int":
+                record[field] = required[field]["max"] + 1
+            elif breakage == "type" and required[field]["type"] == "int":
+                record[field] = str(record[field])
+            else:
+                record[field] = "unknown"
+        records.append(record)
+    return records
+
+
+def throughput(elapsed, count):
+    return {
+        "total_ms": round(elapsed * 1000, 3),
+        "us_per_record": round(elapsed / count * 1e6, 3),
+        "records_per_s": round(count / elapsed)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark registration input validation.")
+    parser.add_argument("--records", type=int, default=20000)
+    parser.add_argument("--invalid", type=float, default=0.2, help="fraction of records with one broken field")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    records = make_records(args.records, args.invalid, random.Random(args.seed))
+
+    started = time.perf_counter()
+    validator = InputValidator(reload_seconds=0)
+    compile_ms = (time.perf_counter() - started) * 1000
+
+    started = time.perf_counter()
+    legacy = [legacy_validate(r) for r in records]
+    legacy_s = time.perf_counter() - started
+
+    started = time.perf_counter()
+    single = [validator.validate(r) for r in records]
+    single_s = time.perf_counter() - started
+
+    started = time.perf_counter()
+    batch = validator.validate_many(records)
+    batch_s = time.perf_counter() - started
+
+    # the compiled validator also enforces optional_fields, which these records never set
+    mismatches = sum(1 for a, b in zip(legacy, single) if a != b)
+    print(json.dumps({
+        "records": len(records),
+        "invalid": sum(1 for ok, _ in batch if not ok),
+        "compile_ms": round(compile_ms, 3),
+        "legacy_file_read": throughput(legacy_s, len(records)),
+        "compiled_validate": throughput(single_s, len(records)),
+        "compiled_validate_many": throughput(batch_s, len(records)),
+        "mismatches": mismatches + sum(1 for a, b in zip(single, batch) if a != b)
+    }, indent=4))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,233 @@
+"""
+Typo-correction benchmark: agent.vocab_matcher vs the Gemini intent path.
+
+    python bench_vocab.py                          # matcher only (no API key needed)
+    python bench_vocab.py --llm --llm-samples 50   # also ask IntentAgent.classify_llm
+
+Cases are seeded random typos (deletion, insertion, substitution,
+transposition) of every domain phrase, wrapped in a few chat-style
+templates, plus the hand-written examples from the intent prompt. A case
+counts as correct when the expected phrase is what the matcher (or the
+LLM's "subject") comes back with. Matcher latency is reported cold (memo
+cleared) and warm.
+
+Negative cases are correctly spelled text outside the vocabulary: the
+hand-written CORRECT list, plurals of vocabulary words and English words
+within two edits of one. correct() must return them unchanged; the
+false-correction rate is reported alongside accuracy. The report is
+printed as JSON.
+"""
+import argparse
+import json
+import os
+import random
+import time
+
+from agent.cache import normalize_text
+from agent.vocab_matcher import osa_distance
+from bench_util import percentile
+
+TEMPLATES = ("{}", "improve my {}", "drills for {}", "how to play {}", "{} tips")
+
+# (query, expected phrase) pairs written by hand
+CURATED = [
+    ("improve powet hitting", "power hitting"),
+    ("drils for foot wrk", "footwork"),
+    ("how to play cover drve", "cover drive"),
+    ("pul shot", "pull shot"),
+    ("backlfit basics", "backlift"),
+    ("stamna exercises", "stamina"),
+    ("strike rotaton drills", "strike rotation"),
+    ("how to play the sweap shot", "sweep shot"),
+]
+
+# correctly spelled queries that must come back unchanged
+CORRECT = [
+    "leg before wicket",
+    "bowling a yorker",
+    "short pitched bowling",
+    "over rate penalty",
+    "how do fielders stop boundaries",
+    "what is the follow on rule",
+    "batting against swinging deliveries",
+    "stretches after bowling spells",
+    "who won the world cup final",
+    "catching practice for slip fielders",
+    "running between the wickets faster",
+    "how many overs in a powerplay",
+]
+
+LETTERS = "abcdefghijklmnopqrstuvwxyz"
+
+
+def typo(word, rng):
+    """One random edit of word."""
+    i = rng.randrange(len(word))
+    kind = rng.choice(("delete", "insert", "substitute", "transpose"))
+    if kind == "delete":
+        return word[:i] + word[i + 1:]
+    if kind == "insert":
+        return word[:i] + rng.choice(LETTERS) + word[i:]
+    if kind == "substitute":
+        return word[:i] + rng.choice(LETTERS.replace(word[i], "")) + word[i + 1:]
+    i = min(i, len(word) - 2)
+    return word[:i] + word[i + 1] + word[i] + word[i + 2:]
+
+
+def make_cases(matcher, per_phrase, seed):
+    """[(query, expected phrase)]: misspellings of every multi-letter domain phrase."""
+    rng = random.Random(seed)
+    phrases = sorted({normalize_text(entries[0][0]) for entries in matcher.phrases.values()})
+    cases = list(CURATED)
+    for phrase in phrases:
+        words = phrase.split()
+        # only words the matcher is allowed to touch (see _correct_word)
+        editable = [i for i, w in enumerate(words) if len(w) >= 5 and w.isalpha()]
+        if not editable:
+            continue
+        for _ in range(per_phrase):
+            i = rng.choice(editable)
+            misspelt = list(words)
+            misspelt[i] = typo(words[i], rng)
+            if len(words[i]) >= 8 and rng.random() < 0.3:
+                misspelt[i] = typo(misspelt[i], rng)   # a second slip on long words
+            cases.append((rng.choice(TEMPLATES).format(" ".join(misspelt)), phrase))
+    return cases
+
+
+def make_negatives(matcher, known_words, seed):
+    """Correctly spelled words and phrases outside the vocabulary that correct() must not touch."""
+    rng = random.Random(seed)
+    words = sorted(w for w in matcher.words if len(w) >= 4 and w.isalpha())
+    cases = list(CORRECT)
+    # plurals of vocabulary words that are not vocabulary words themselves
+    cases.extend(rng.choice(TEMPLATES).format(w + "s") for w in words
+                 if not w.endswith("s") and w + "s" not in matcher.words)
+    # real English words one or two edits away from a vocabulary word
+    for word in sorted(set(known_words) - set(matcher.words)):
+        if len(word) >= 4 and any(osa_distance(word, v, 2) <= 2 for v in words):
+            cases.append(rng.choice(TEMPLATES).format(word))
+    return cases
+
+
+def same(found, expected):
+    # "foot work", "footwork" and "Foot-work" are the same answer
+    return bool(found) and normalize_text(found).replace(" ", "") == normalize_text(expected).replace(" ", "")
+
+
+def bench_matcher(matcher, cases):
+    hits = 0
+    misses = []
+    cold = []
+    matcher.correct_word.cache_clear()
+    for query, expected in cases:
+        started = time.perf_counter()
+        found = matcher.match(query)
+        cold.append((time.perf_counter() - started) * 1000)
+        if found and same(found["phrase"], expected):
+            hits += 1
+        elif len(misses) < 15:
+            misses.append({"query": query, "expected": expected, "got": found and found["phrase"]})
+
+    warm = []
+    for query, _ in cases:
+        started = time.perf_counter()
+        matcher.match(query)
+        warm.append((time.perf_counter() - started) * 1000)
+
+    return {
+        "cases": len(cases),
+        "accuracy": round(hits / len(cases), 4),
+        "cold_p50_ms": percentile(cold, 50),
+        "cold_p99_ms": percentile(cold, 99),
+        "warm_p50_ms": percentile(warm, 50),
+        "warm_p99_ms": percentile(warm, 99),
+        "sample_misses": misses
+    }
+
+
+def bench_negatives(matcher, cases):
+    wrong = [(text, matcher.correct(text)) for text in cases]
+    wrong = [(text, got) for text, got in wrong if got != normalize_text(text)]
+    return {
+        "cases": len(cases),
+        "false_corrections": len(wrong),
+        "false_correction_rate": round(len(wrong) / len(cases), 4),
+        "sample_false_corrections": [{"query": q, "got": g} for q, g in wrong[:15]]
+    }
+
+
+def bench_llm(matcher, cases):
+    from agent.intent_agent import IntentAgent
+
+    agent = IntentAgent()
+    hits = 0
+    agreed = 0
+    fallbacks = 0
+    samples = []
+    for query, expected in cases:
+        started = time.perf_counter()
+        result = agent.classify_llm(query)
+        samples.append((time.perf_counter() - started) * 1000)
+        if result.get("tier") != "llm":
+            fallbacks += 1
+        subject = str(result.get("subject", ""))
+        if same(subject, expected):
+            hits += 1
+        local = matcher.match(query)
+        if local and same(subject, local["phrase"]):
+            agreed += 1
+
+    return {
+        "backend": os.getenv("LLM_BACKEND", "live"),
+        "cases": len(cases),
+        "accuracy": round(hits / len(cases), 4),
+        "agrees_with_matcher": round(agreed / len(cases), 4),
+        "fallbacks": fallbacks,
+        "p50_ms": percentile(samples, 50),
+        "p99_ms": percentile(samples, 99)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark local typo correction against the LLM.")
+    parser.add_argument("--per-phrase", type=int, default=3, help="misspellings generated per domain phrase")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--llm", action="store_true", help="also run the cases through IntentAgent.classify_llm")
+    parser.add_argument("--llm-samples", type=int, default=40, help="cases sent to the LLM (curated ones first)")
+    args = parser.parse_args()
+
+    from agent.vocab_matcher import VocabMatcher, domain_terms, english_words
+
+    known_words = english_words()
+    started = time.perf_counter()
+    matcher = VocabMatcher(domain_terms(), known_words=known_words)
+    build_ms = (time.perf_counter() - started) * 1000
+
+    cases = make_cases(matcher, args.per_phrase, args.seed)
+    report = {
+        "build_ms": round(build_ms, 3),
+        "vocabulary_words": len(matcher.words),
+        "known_words": len(matcher.known),
+        "phrases": len(matcher.phrases),
+        "matcher": bench_matcher(matcher, cases),
+        "negatives": bench_negatives(matcher, make_negatives(matcher, known_words, args.seed))
+    }
+
+    if args.llm:
+        # every case should reach Gemini, and must not feed the training log
+        os.environ.setdefault("INTENT_CACHE", "0")
+        os.environ.setdefault("INTENT_LOG", "0")
+        llm_cases = cases[:len(CURATED)] + random.Random(args.seed).sample(
+            cases[len(CURATED):], max(0, min(args.llm_samples - len(CURATED), len(cases) - len(CURATED)))
+        )
+        report["llm"] = bench_llm(matcher, llm_cases)
+        report["matcher_on_llm_cases"] = {
+            k: v for k, v in bench_matcher(matcher, llm_cases).items() if k != "sample_misses"
+        }
+
+    print(json.dumps(report, indent=4))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+import argparse
+import hashlib
+import json
+import os
+
+# Bump whenever text extraction or chunking changes so old entries are rebuilt.
+CACHE_VERSION = 1
+
+
+def file_sha256(file_path):
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def library_fingerprint(salt, books):
+    """Identity of a built library: salt plus (source, text hash, chunk count) of each book."""
+    digest = hashlib.sha1(salt.encode("utf-8"))
+    for source, text, spans in books:
+        digest.update(source.encode("utf-8"))
+        digest.update(hashlib.sha1(text.encode("utf-8")).digest())
+        digest.update(str(len(spans)).encode("ascii"))
+    return digest.hexdigest()
+
+
+class ExtractCache:
+    """
+    On-disk cache of extracted book text and chunk spans, stored in
+    knowledge_base/.cache/text. Entries are keyed by file path and validated
+    against size, mtime and SHA-256 of the file contents.
+
+    BM25 postings are deliberately not cached: turning stored postings back
+    into the index's dicts costs about as much as re-tokenising the chunks
+    (slower with plain JSON), and would double the entry size.
+    """
+
+    def __init__(self, kb_path, cache_dir=None):
+        self.kb_path = kb_path
+        self.cache_dir = cache_dir or os.path.join(kb_path, ".cache")
+        self.entry_dir = os.path.join(self.cache_dir, "text")
+
+    def _entry_path(self, file_path):
+        key = hashlib.sha1(os.path.abspath(file_path).encode("utf-8")).hexdigest()
+        return os.path.join(self.entry_dir, f"{key}.json")
+
+    def _read_entry(self, file_path):
+        try:
+            with open(self._entry_path(file_path), "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        if entry.get("version") != CACHE_VERSION:
+            return None
+        if entry.get("path") != os.path.abspath(file_path):
+            return None
+        return entry
+
+    def _write_entry(self, file_path, entry):
+        """Returns False if the entry could not be written; the cache is best effort."""
+        target = self._entry_path(file_path)
+        # write-then-rename so concurrent workers never read half an entry
+        tmp_path = f"{target}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(self.entry_dir, exist_ok=True)
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(entry, f, ensure_ascii=False)
+            os.replace(tmp_path, target)
+            return True
+        except OSError as e:
+            print(f"[RAG] ⚠️ Could not cache {os.path.basename(file_path)}: {e}")
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            return False
+
+    def load(self, file_path):
+        """Returns (text, spans) for an unchanged file, or None if stale or missing."""
+        entry = self._read_entry(file_path)
+        if entry is None:
+            return None
+
+        stat = os.stat(file_path)
+        if entry["size"] != stat.st_size or entry["mtime_ns"] != stat.st_mtime_ns:
+            # touched but maybe not modified (git checkout, copy): trust the hash
+            if entry["size"] != stat.st_size or entry["sha256"] != file_sha256(file_path):
+                return None
+            entry["mtime_ns"] = stat.st_mtime_ns
+            self._write_entry(file_path, entry)
+
+        return entry["text"], [tuple(span) for span in entry["spans"]]
+
+    def store(self, file_path, text, spans):
+        """Caches the extracted text; returns False (after a warning) instead of raising."""
+        try:
+            stat = os.stat(file_path)
+            digest = file_sha256(file_path)
+        except OSError as e:
+            print(f"[RAG] ⚠️ Could not cache {os.path.basename(file_path)}: {e}")
+            return False
+        return self._write_entry(file_path, {
+            "version": CACHE_VERSION,
+            "path": os.path.abspath(file_path),
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "sha256": digest,
+            "text": text,
+            "spans": spans
+        })
+
+    def prune(self, live_paths):
+        """Deletes entries whose book is no longer in the library. Returns the count removed."""
+        if not os.path.isdir(self.entry_dir):
+            return 0
+
+        live = {os.path.basename(self._entry_path(p)) for p in live_paths}
+        removed = 0
+        for name in os.listdir(self.entry_dir):
+            if name.endswith(".json") and name not in live:
+                try:
+                    os.remove(os.path.join(self.entry_dir, name))
+                except OSError as e:
+                    print(f"[RAG] ⚠️ Could not prune cache entry {name}: {e}")
+                    continue
+                removed += 1
+        return removed
+
+    def clear(self):
+        return self.prune([])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage the knowledge_base text cache.")
+    parser.add_argument("command", choices=["build", "clear"],
+                        help="build: extract every book and refresh the cache; clear: delete it")
+    parser.add_argument("--kb", default=None, help="knowledge_base folder (defaults to backend/knowledge_base)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="process pool size for PDF extraction (default: CPU count)")
+    parser.add_argument("--mode", default=None, choices=["bm25", "dense", "hybrid"],
+                        help="also build the FAISS vector index for dense/hybrid retrieval")
+    args = parser.parse_args()
+
+    from rag_engine import RagEngine
+
+    if args.command == "build":
+        engine = RagEngine(kb_path=args.kb, workers=args.workers, mode=args.mode)
+        print(f"[RAG] 💾 Cache ready: {len(engine.index.segments)} books, {engine.index.chunk_count} chunks")
+    else:
+        kb_path = args.kb or os.path.join(os.path.dirname(os.path.abspath(__file__)), "knowledge_base")
+        removed = ExtractCache(kb_path).clear()
+        print(f"[RAG] 🧹 Removed {removed} cache entries")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+import io
+import json
+import mmap
+import os
+import struct
+from array import array
+
+# File layout:
+#   MAGIC | u64 header length | JSON header | u64 chunk table (start, end pairs) | UTF-8 text
+MAGIC = b"CMCORP02"
+_HEADER_LEN = struct.Struct("<Q")
+
+
+class CorpusStore:
+    """
+    The whole library packed into one file and opened with mmap.
+    Chunk text is decoded lazily from byte offsets, so every worker reads
+    the same page cache instead of holding its own copy of each book.
+    """
+
+    def __init__(self, path, mm=None):
+        self.path = path
+        if mm is None:
+            with open(path, "rb") as f:
+                mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._mm = mm
+
+        if self._mm[:len(MAGIC)] != MAGIC:
+            self._mm.close()
+            raise ValueError(f"{path} is not a corpus file")
+
+        pos = len(MAGIC)
+        (header_len,) = _HEADER_LEN.unpack_from(self._mm, pos)
+        pos += _HEADER_LEN.size
+        header = json.loads(self._mm[pos:pos + header_len].decode("utf-8"))
+        pos += header_len
+
+        self.fingerprint = header["fingerprint"]
+        self.sources = header["sources"]
+        # source -> index of its first chunk in the offset table
+        self._first_chunk = {}
+        self._chunk_count = {}
+        # source -> (start, end) byte range of the whole book
+        self._book_range = {}
+        for source, first, count, book_range in zip(self.sources, header["first_chunk"],
+                                                    header["chunk_count"], header["book_ranges"]):
+            self._first_chunk[source] = first
+            self._chunk_count[source] = count
+            self._book_range[source] = tuple(book_range)
+
+        table_len = header["table_entries"] * 8
+        self._offsets = array("Q")
+        self._offsets.frombytes(self._mm[pos:pos + table_len])
+        self._text_start = pos + table_len
+
+    @staticmethod
+    def _pack(f, books, fingerprint):
+        """Writes [(source, text, spans), ...] to the binary file object f."""
+        sources, first_chunk, chunk_count, book_ranges = [], [], [], []
+        offsets = array("Q")
+        blob = []
+        byte_pos = 0
+
+        for source, text, spans in books:
+            sources.append(source)
+            first_chunk.append(len(offsets) // 2)
+            chunk_count.append(len(spans))
+
+            # character spans -> byte offsets, walking each book once
+            book_start = byte_pos
+            char_pos = 0
+            for start, end in spans:
+                byte_pos += len(text[char_pos:start].encode("utf-8"))
+                chunk_start = byte_pos
+                byte_pos += len(text[start:end].encode("utf-8"))
+                offsets.extend((chunk_start, byte_pos))
+                char_pos = end
+            byte_pos += len(text[char_pos:].encode("utf-8"))
+            book_ranges.append((book_start, byte_pos))
+            blob.append(text)
+
+        header = json.dumps({
+            "fingerprint": fingerprint,
+            "sources": sources,
+            "first_chunk": first_chunk,
+            "chunk_count": chunk_count,
+            "book_ranges": book_ranges,
+            "table_entries": len(offsets)
+        }).encode("utf-8")
+
+        f.write(MAGIC)
+        f.write(_HEADER_LEN.pack(len(header)))
+        f.write(header)
+        f.write(offsets.tobytes())
+        for text in blob:
+            f.write(text.encode("utf-8"))
+
+    @classmethod
+    def compile(cls, path, books, fingerprint):
+        """Writes [(source, text, spans), ...] to `path` atomically."""
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                cls._pack(f, books, fingerprint)
+            # replacing keeps old mappings valid: they still point at the previous inode
+            os.replace(tmp_path, path)
+        except OSError:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+
+    @classmethod
+    def in_memory(cls, books, fingerprint):
+        """Same layout in an anonymous mapping, for when the cache folder is not writable."""
+        buffer = io.BytesIO()
+        cls._pack(buffer, books, fingerprint)
+        data = buffer.getbuffer()
+        mm = mmap.mmap(-1, len(data))
+        mm.write(data)
+        return cls(None, mm)
+
+    @classmethod
+    def open_or_compile(cls, path, books, fingerprint):
+        """
+        Reuses the corpus file at `path` if its fingerprint matches, otherwise
+        rebuilds it. If it cannot be written, the corpus is kept in memory.
+        """
+        try:
+            store = cls(path)
+            if store.fingerprint == fingerprint:
+                return store
+            store.close()
+        except (OSError, ValueError):
+            pass
+
+        try:
+            cls.compile(path, books, fingerprint)
+            return cls(path)
+        except OSError as e:
+            print(f"[RAG] ⚠️ Could not write {path}: {e} -- keeping the corpus in memory")
+            return cls.in_memory(books, fingerprint)
+
+    def chunk_count(self, source):
+        return self._chunk_count.get(source, 0)
+
+    def chunk_text(self, source, chunk_index):
+        row = (self._first_chunk[source] + chunk_index) * 2
+        start = self._text_start + self._offsets[row]
+        end = self._text_start + self._offsets[row + 1]
+        return self._mm[start:end].decode("utf-8")
+
+    def book_text(self, source):
+        """Full text of one book (used to rebuild the corpus around unchanged books)."""
+        start, end = self._book_range[source]
+        return self._mm[self._text_start + start:self._text_start + end].decode("utf-8")
+
+    @property
+    def size_bytes(self):
+        return len(self._mm)
+
+    def close(self):
+        self._mm.close()
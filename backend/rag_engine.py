@@ -1,86 +1,510 @@
+import multiprocessing
 import os
-import re
-# You must run: pip install pypdf
-from pypdf import PdfReader 
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from rag_cache import ExtractCache, library_fingerprint
+from rag_corpus import CorpusStore
+from rag_extract import extract_text, extraction_tasks
+from rag_index import (
+    PASSAGE_CHARS, BM25Index, DocumentSegment, best_window, expand_window, split_chunks, tokenize
+)
+from rag_vectors import VectorIndex
+
+RETRIEVAL_MODES = ("bm25", "dense", "hybrid")
+
+
+class LibrarySnapshot:
+    """Everything search() reads. A reload builds a new one and swaps the reference."""
+
+    __slots__ = ("index", "corpus", "vectors", "signatures", "generation", "failed")
+
+    def __init__(self, index, corpus=None, vectors=None, signatures=None, generation=0, failed=None):
+        self.index = index
+        self.corpus = corpus
+        self.vectors = vectors
+        # filename -> (size, mtime_ns) of the files this snapshot was built from
+        self.signatures = signatures or {}
+        self.generation = generation
+        # filename -> (size, mtime_ns) of books whose extraction failed; retried once the file changes
+        self.failed = failed or {}
+
 
 class RagEngine:
-    def __init__(self):
+    def __init__(self, kb_path=None, top_k=3, use_cache=True, workers=None, background=False, mode=None):
         # 1. Find the Library Folder
         base_dir = os.path.dirname(os.path.abspath(__file__))
-        self.kb_path = os.path.join(base_dir, "knowledge_base")
-        
-        self.library = {}
-        self._load_library()
+        self.kb_path = kb_path or os.path.join(base_dir, "knowledge_base")
+        self.top_k = top_k
+        # Process pool size for cold PDF extraction (1 = extract in this process)
+        self.workers = workers if workers is not None else int(os.getenv("RAG_WORKERS", "1"))
+
+        self.cache = ExtractCache(self.kb_path) if use_cache else None
+
+        # Retrieval: "bm25" (lexical), "dense" (FAISS embeddings) or "hybrid" (both, fused)
+        self.mode = mode or os.getenv("RAG_MODE", "bm25")
+        if self.mode not in RETRIEVAL_MODES:
+            raise ValueError(f"Unknown RAG_MODE '{self.mode}', expected one of {RETRIEVAL_MODES}")
+        # why the last vector build failed; searches fall back to bm25 until a reload succeeds
+        self.vector_error = None
+        # weight of the dense score in hybrid mode (lexical gets 1 - alpha)
+        self.hybrid_alpha = float(os.getenv("RAG_HYBRID_ALPHA", "0.5"))
+        # Return the best query-term window of each chunk instead of the whole chunk
+        self.passages = os.getenv("RAG_PASSAGES", "1") == "1"
+        self.passage_pool = 20
+        # share of the passage score taken from the window (the rest is the retrieval score)
+        self.passage_weight = float(os.getenv("RAG_PASSAGE_WEIGHT", "0.5"))
+        self.latency = {
+            "bm25_build_ms": None,
+            "vector_build_ms": None,
+            "last_reload_ms": None,
+            "queries": 0,
+            "query_total_ms": 0.0,
+            "query_max_ms": 0.0
+        }
+
+        # Book text lives in a memory-mapped corpus file shared by all workers
+        self.corpus_path = os.path.join(self.kb_path, ".cache", "corpus.bin")
+        self._snapshot = LibrarySnapshot(BM25Index([]))
+        self._reload_lock = threading.Lock()
+        self._stop_watch = threading.Event()
+
+        # Readiness: set once the index is built (or loading failed)
+        self.ready = threading.Event()
+        self.progress = {
+            "state": "idle",
+            "books_total": 0,
+            "books_loaded": 0,
+            "tasks_total": 0,
+            "tasks_done": 0,
+            "chunks": 0,
+            "elapsed_ms": None,
+            "error": None
+        }
+
+        if background:
+            # Index on a daemon thread so the API can serve non-RAG requests right away
+            threading.Thread(target=self._run_load, name="rag-loader", daemon=True).start()
+        else:
+            self._run_load()
+
+    # Read-only views of the live snapshot
+    @property
+    def index(self):
+        return self._snapshot.index
+
+    @property
+    def corpus(self):
+        return self._snapshot.corpus
+
+    @property
+    def vectors(self):
+        return self._snapshot.vectors
+
+    @property
+    def generation(self):
+        """Bumped on every (re)load that changed the library."""
+        return self._snapshot.generation
+
+    def _run_load(self):
+        started = time.perf_counter()
+        self.progress["state"] = "loading"
+        try:
+            self._load_library()
+            self.progress["state"] = "ready"
+        except Exception as e:
+            print(f"[RAG] ❌ Library failed to load: {e}")
+            self.progress["state"] = "failed"
+            self.progress["error"] = str(e)
+        finally:
+            self.progress["elapsed_ms"] = round((time.perf_counter() - started) * 1000)
+            self.ready.set()
+
+    def wait_ready(self, timeout=None):
+        """Blocks up to `timeout` seconds for the library. True if it is searchable."""
+        self.ready.wait(timeout)
+        return self.progress["state"] == "ready"
+
+    def status(self):
+        """Loading progress and retrieval latency for the readiness endpoint."""
+        latency = dict(self.latency)
+        latency["query_avg_ms"] = round(latency["query_total_ms"] / latency["queries"], 3) if latency["queries"] else None
+        return dict(self.progress, ready=self.progress["state"] == "ready", mode=self.mode,
+                    vector_error=self.vector_error, generation=self.generation, latency=latency)
 
     def _load_library(self):
-        """Reads all .txt and .pdf files from the knowledge_base folder."""
+        """Reads all .txt and .pdf files from the knowledge_base folder, using the disk cache when possible."""
         if not os.path.exists(self.kb_path):
             print(f"[RAG] ❌ Warning: Library folder not found at {self.kb_path}")
             return
 
         print(f"[RAG] 📚 Loading Library from: {self.kb_path}...")
+        self.reload()
+
+    def _scan(self):
+        """filename -> (size, mtime_ns) for every book currently in the folder."""
+        if not os.path.isdir(self.kb_path):
+            return {}
 
+        signatures = {}
         for filename in os.listdir(self.kb_path):
-            file_path = os.path.join(self.kb_path, filename)
-            
-            # --- CASE A: TEXT FILES ---
-            if filename.endswith(".txt"):
+            if filename.endswith((".txt", ".pdf")):
+                stat = os.stat(os.path.join(self.kb_path, filename))
+                signatures[filename] = (stat.st_size, stat.st_mtime_ns)
+        return signatures
+
+    def reload(self):
+        """
+        Re-reads only the books added, changed or removed since the last load,
+        rebuilds the index around the untouched ones and swaps the new snapshot
+        in with a single assignment, so in-flight searches never see a half-built
+        state. Returns a summary dict, or None when nothing changed.
+        """
+        with self._reload_lock:
+            started = time.perf_counter()
+            old = self._snapshot
+            current = self._scan()
+
+            # a book that failed to extract is only retried once its file changes again
+            added = sorted(
+                name for name in set(current) - set(old.signatures)
+                if old.failed.get(name) != current[name]
+            )
+            removed = sorted(set(old.signatures) - set(current))
+            changed = sorted(
+                name for name in set(current) & set(old.signatures)
+                if current[name] != old.signatures[name] and old.failed.get(name) != current[name]
+            )
+            if not (added or changed or removed) and (old.generation or not current):
+                if self.mode != "bm25" and old.vectors is None and old.generation:
+                    self._retry_vectors(old)
+                return None
+
+            fresh = self._read_books([os.path.join(self.kb_path, name) for name in added + changed])
+            # still-failing books keep their entry; deleted or reverted ones drop out
+            failed = {name: sig for name, sig in old.failed.items() if current.get(name) == sig}
+            failed.update((name, current[name]) for name in added + changed if name not in fresh)
+
+            if not fresh and not removed and old.generation:
+                # every read failed: nothing to rebuild and no answer cache to invalidate
+                self._snapshot = LibrarySnapshot(old.index, old.corpus, old.vectors, old.signatures,
+                                                 old.generation, failed)
+                print(f"[RAG] ⚠️ Failed to extract, will retry once the file changes: {', '.join(sorted(failed))}")
+                return None
+
+            old_segments = {seg.source: seg for seg in old.index.segments}
+
+            # untouched books keep their segment and are re-read from the old corpus
+            books = []
+            segments = []
+            signatures = dict(current)
+            for name in sorted(current):
+                if name in fresh:
+                    text, spans = fresh[name]
+                    segment = DocumentSegment(name, text, spans)
+                elif name in old_segments:
+                    # unchanged, or changed but failed to extract: keep serving the old text
+                    segment = old_segments[name]
+                    text, spans = old.corpus.book_text(name), segment.spans
+                    signatures[name] = old.signatures[name]
+                else:
+                    # book that has never extracted: not in the index, tracked in `failed`
+                    del signatures[name]
+                    continue
+                books.append((name, text, spans))
+                segments.append(segment)
+
+            index = self._build_index(segments)
+            corpus = self._open_corpus(books)
+            vectors = self._build_vectors(books, old.vectors, set(fresh)) if self.mode != "bm25" else None
+
+            self._snapshot = LibrarySnapshot(index, corpus, vectors, signatures, old.generation + 1, failed)
+
+            if self.cache:
+                self.cache.prune([os.path.join(self.kb_path, name) for name in current])
+
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            self.latency["last_reload_ms"] = round(elapsed_ms)
+            self.progress["books_total"] = len(current)
+            self.progress["books_loaded"] = len(books)
+            print(f"[RAG] 🔄 Library generation {old.generation + 1}: +{len(added)} ~{len(changed)} "
+                  f"-{len(removed)} books ({len(books)} total, {index.chunk_count} chunks) in {elapsed_ms:.0f} ms")
+            if failed:
+                print(f"[RAG] ⚠️ Failed to extract, will retry once the file changes: {', '.join(sorted(failed))}")
+
+            return {
+                "generation": old.generation + 1,
+                "added": added,
+                "changed": changed,
+                "removed": removed,
+                "failed": sorted(failed),
+                "books": len(books),
+                "chunks": index.chunk_count,
+                "elapsed_ms": round(elapsed_ms)
+            }
+
+    def watch(self, interval=None):
+        """Polls the knowledge_base folder every `interval` seconds and hot-reloads changed books."""
+        interval = interval or float(os.getenv("RAG_WATCH_INTERVAL", "10"))
+        self._stop_watch.clear()
+
+        def poll():
+            self.ready.wait()
+            while not self._stop_watch.wait(interval):
                 try:
-                    with open(file_path, "r", encoding="utf-8") as f:
-                        self.library[filename] = f.read()
-                    print(f"[RAG] ✅ Loaded Book: {filename}")
+                    self.reload()
                 except Exception as e:
-                    print(f"[RAG] ⚠️ Error reading {filename}: {e}")
+                    print(f"[RAG] ⚠️ Hot reload failed: {e}")
+
+        threading.Thread(target=poll, name="rag-watcher", daemon=True).start()
+        print(f"[RAG] 👀 Watching {self.kb_path} every {interval:g}s")
 
-            # --- CASE B: PDF FILES ---
-            elif filename.endswith(".pdf"):
+    def stop_watch(self):
+        self._stop_watch.set()
+
+    def _read_books(self, book_paths):
+        """Returns filename -> (text, spans) for the given books, from the disk cache or freshly extracted."""
+        library = {}
+        cold_paths = []
+
+        for file_path in book_paths:
+            filename = os.path.basename(file_path)
+
+            # Unchanged books come straight from the disk cache
+            cached = self.cache.load(file_path) if self.cache else None
+            if cached:
+                library[filename] = cached
+                print(f"[RAG] ⚡ Cached: {filename}")
+            else:
+                cold_paths.append(file_path)
+
+        extracted = self._extract_books(cold_paths)
+
+        for file_path in cold_paths:
+            filename = os.path.basename(file_path)
+            if filename not in extracted:
+                continue
+            text = extracted[filename]
+            library[filename] = (text, split_chunks(text))
+            if self.cache:
+                self.cache.store(file_path, text, library[filename][1])
+            print(f"[RAG] ✅ Loaded Book: {filename}")
+
+        return library
+
+    def _extract_books(self, file_paths):
+        """
+        Extracts the text of every cold book. With workers > 1 the books (or
+        page ranges of large PDFs) are fanned out over a process pool and
+        merged back in page order, so the result matches a serial run.
+        """
+        if not file_paths:
+            return {}
+
+        tasks = []
+        for file_path in file_paths:
+            try:
+                tasks.extend(extraction_tasks(file_path) if self.workers > 1 else [(file_path, 0, None)])
+            except Exception as e:
+                print(f"[RAG] ⚠️ Error reading {os.path.basename(file_path)}: {e}")
+
+        started = time.perf_counter()
+        self.progress["tasks_total"] = len(tasks)
+        self.progress["tasks_done"] = 0
+        outcomes = []
+        if self.workers > 1 and len(tasks) > 1:
+            # spawn, not fork: the loader may run on a background thread of a live server
+            with ProcessPoolExecutor(max_workers=min(self.workers, len(tasks)),
+                                     mp_context=multiprocessing.get_context("spawn")) as pool:
+                futures = [pool.submit(extract_text, *task) for task in tasks]
+                for future in futures:
+                    try:
+                        outcomes.append(future.result())
+                    except Exception as e:
+                        outcomes.append(e)
+                    self.progress["tasks_done"] += 1
+        else:
+            for task in tasks:
                 try:
-                    reader = PdfReader(file_path)
-                    text_content = ""
-                    # Merge all pages into one text block
-                    for page in reader.pages:
-                        extracted = page.extract_text()
-                        if extracted:
-                            text_content += extracted + "\n"
-                    
-                    self.library[filename] = text_content
-                    print(f"[RAG] ✅ Loaded PDF: {filename}")
+                    outcomes.append(extract_text(*task))
                 except Exception as e:
-                    print(f"[RAG] ⚠️ Error reading PDF {filename}: {e}")
+                    outcomes.append(e)
+                self.progress["tasks_done"] += 1
+
+        parts = {}
+        failed = set()
+        for (file_path, _, _), outcome in zip(tasks, outcomes):
+            filename = os.path.basename(file_path)
+            if isinstance(outcome, Exception):
+                if filename not in failed:
+                    print(f"[RAG] ⚠️ Error reading {filename}: {outcome}")
+                failed.add(filename)
+            else:
+                parts.setdefault(filename, []).append(outcome)
+
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        print(f"[RAG] 🔧 Extracted {len(tasks)} tasks from {len(file_paths)} books "
+              f"with {max(1, self.workers)} worker(s) in {elapsed_ms:.0f} ms")
+
+        return {name: "".join(chunks) for name, chunks in parts.items() if name not in failed}
+
+    def _build_index(self, segments):
+        """Builds the BM25 index over the given DocumentSegments."""
+        started = time.perf_counter()
+        index = BM25Index(segments)
+        self.progress["chunks"] = index.chunk_count
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        self.latency["bm25_build_ms"] = round(elapsed_ms)
+        print(f"[RAG] 🗂️ Indexed {index.chunk_count} chunks from {len(segments)} books in {elapsed_ms:.0f} ms")
+        return index
+
+    def _open_corpus(self, books):
+        """Maps the packed corpus file, recompiling it only when the library changed."""
+        started = time.perf_counter()
+        corpus = CorpusStore.open_or_compile(self.corpus_path, books, library_fingerprint("corpus", books))
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        print(f"[RAG] 🗜️ Corpus mapped: {corpus.size_bytes / 1e6:.1f} MB in {elapsed_ms:.0f} ms")
+        return corpus
+
+    def _build_vectors(self, books, previous=None, changed=()):
+        """Builds (or reloads from disk) the FAISS index for dense / hybrid mode."""
+        cache_dir = self.cache.cache_dir if self.cache else os.path.join(self.kb_path, ".cache")
+        try:
+            vectors = VectorIndex(cache_dir).build(books, previous, changed)
+        except Exception as e:
+            # missing packages, model download / offline hub, corrupt vectors.faiss, ...:
+            # search() serves bm25 without vectors, and the next reload tries again
+            error = str(e) if isinstance(e, ImportError) else repr(e)
+            if error != self.vector_error:
+                print(f"[RAG] ⚠️ Vector index failed: {error} -- serving bm25 until a reload succeeds")
+            self.vector_error = error
+            return None
+        self.vector_error = None
 
-    def search(self, query):
+        self.latency["vector_build_ms"] = vectors.stats["build_ms"]
+        origin = "loaded" if vectors.stats["loaded_from_disk"] else f"{vectors.stats['embedded']} embedded"
+        print(f"[RAG] 🧭 Vector index ({origin}): {vectors.stats['vectors']} chunks "
+              f"with {vectors.model_name} in {vectors.stats['build_ms']} ms")
+        return vectors
+
+    def _retry_vectors(self, old):
+        """Builds the vectors a previous reload could not, keeping the current index and corpus."""
+        books = [(seg.source, old.corpus.book_text(seg.source), seg.spans) for seg in old.index.segments]
+        vectors = self._build_vectors(books)
+        if vectors is not None:
+            self._snapshot = LibrarySnapshot(old.index, old.corpus, vectors, old.signatures,
+                                             old.generation, old.failed)
+
+    def _lexical_hits(self, snapshot, query, top_k):
+        return [
+            ((snapshot.index.segments[seg_index].source, chunk_index), score)
+            for seg_index, chunk_index, score in snapshot.index.search(query, top_k)
+        ]
+
+    def _hybrid_hits(self, snapshot, query, top_k):
+        """Fuses min-max normalised BM25 and cosine scores over both candidate lists."""
+        pool = max(top_k * 4, 20)
+        fused = {}
+
+        for weight, hits in ((1 - self.hybrid_alpha, self._lexical_hits(snapshot, query, pool)),
+                             (self.hybrid_alpha, snapshot.vectors.search(query, pool))):
+            if not hits:
+                continue
+            high = hits[0][1]
+            low = hits[-1][1]
+            spread = high - low
+            for key, score in hits:
+                norm = (score - low) / spread if spread else 1.0
+                fused[key] = fused.get(key, 0.0) + weight * norm
+
+        return sorted(fused.items(), key=lambda item: item[1], reverse=True)[:top_k]
+
+    def search(self, query, top_k=None):
         """
-        Searches the library for keywords and returns the most relevant paragraphs.
+        Ranks the library chunks against the query (BM25, dense or hybrid),
+        then (RAG_PASSAGES=1) narrows each to its best passage.
+        Returns the top-k as dicts (source, chunk_id, score, text, ...), best first.
         """
-        query_words = query.lower().split()
-        found_chunks = []
-
-        # Search every book in the library
-        for filename, content in self.library.items():
-            
-            # Simple scoring: How many keywords appear in this book?
-            if any(word in content.lower() for word in query_words):
-                
-                # Find the best match position
-                # (We look for the first occurrence of the main keyword)
-                index = -1
-                for word in query_words:
-                    if len(word) > 3: # Ignore small words like 'the', 'how'
-                        idx = content.lower().find(word)
-                        if idx != -1:
-                            index = idx
-                            break
-                
-                if index != -1:
-                    # Grab 1000 characters of context around the keyword
-                    start = max(0, index - 300)
-                    end = min(len(content), index + 1000)
-                    snippet = content[start:end].replace("\n", " ")
-                    
-                    found_chunks.append(f"\n📘 SOURCE: {filename}\n...{snippet}...\n")
-
-        if not found_chunks:
-            return None
+        top_k = top_k or self.top_k
+        # one snapshot for the whole call, even if a reload swaps it meanwhile
+        snapshot = self._snapshot
+        started = time.perf_counter()
+        # passage ranking re-orders a wider pool of candidate chunks
+        pool = max(top_k, self.passage_pool) if self.passages else top_k
+
+        if self.mode == "dense" and snapshot.vectors:
+            hits = snapshot.vectors.search(query, pool)
+        elif self.mode == "hybrid" and snapshot.vectors:
+            hits = self._hybrid_hits(snapshot, query, pool)
+        else:
+            hits = self._lexical_hits(snapshot, query, pool)
+
+        if self.passages:
+            results = self._rank_passages(snapshot, query, hits, top_k)
+        else:
+            results = [
+                {
+                    "source": source,
+                    "chunk_id": chunk_index,
+                    "score": round(score, 4),
+                    "text": snapshot.corpus.chunk_text(source, chunk_index).replace("\n", " ")
+                }
+                for (source, chunk_index), score in hits
+            ]
+
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        self.latency["queries"] += 1
+        self.latency["query_total_ms"] += elapsed_ms
+        self.latency["query_max_ms"] = max(self.latency["query_max_ms"], round(elapsed_ms, 3))
+
+        return results
+
+    def _rank_passages(self, snapshot, query, hits, top_k):
+        """
+        Scores the best window of every candidate chunk by query-term coverage
+        and proximity, blends it with the chunk's retrieval score (both scaled
+        to 0..1 over the candidates), then keeps the best top_k windows across
+        all books. A dense match with no query term keeps its retrieval rank
+        share. Only the candidate chunks are scanned, never whole books.
+        """
+        weights = {term: snapshot.index.idf(term) for term in set(tokenize(query))}
+        passages = []
+        if not hits:
+            return passages
+
+        for (source, chunk_index), chunk_score in hits:
+            text = snapshot.corpus.chunk_text(source, chunk_index)
+            window = best_window(text, weights) if weights else None
+            if window:
+                score, start, end = window
+            else:
+                score, start, end = 0.0, 0, min(len(text), PASSAGE_CHARS)
+            start, end = expand_window(text, start, end)
+            passages.append({
+                "source": source,
+                "chunk_id": chunk_index,
+                "window_score": round(score, 4),
+                "chunk_score": round(chunk_score, 4),
+                "start": start,
+                "end": end,
+                "text": text[start:end].replace("\n", " ")
+            })
+
+        top_window = max(p["window_score"] for p in passages)
+        high = max(p["chunk_score"] for p in passages)
+        low = min(p["chunk_score"] for p in passages)
+        spread = high - low
+        for p in passages:
+            window = p["window_score"] / top_window if top_window else 0.0
+            chunk = (p["chunk_score"] - low) / spread if spread else 1.0
+            p["score"] = round(self.passage_weight * window + (1 - self.passage_weight) * chunk, 4)
+
+        passages.sort(key=lambda p: (p["score"], p["chunk_score"]), reverse=True)
+        return passages[:top_k]
 
-        # Return top 3 results
-        return "\n".join(found_chunks[:3])
\ No newline at end of file
+    def build_context(self, results):
+        """Formats search() results as the context block sent to the summariser."""
+        return "\n".join(
+            f"\n📘 SOURCE: {r['source']}\n...{r['text']}...\n" for r in results
+        )
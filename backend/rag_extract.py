@@ -0,0 +1,37 @@
+# Text extraction for the RAG process pool. Spawned workers import only this
+# module, not rag_engine, so they never load the index, corpus or vector stack.
+# You must run: pip install pypdf
+from pypdf import PdfReader
+
+# PDFs longer than this are split into page ranges for the process pool
+PAGES_PER_TASK = 40
+
+
+def extract_text(file_path, start=0, stop=None):
+    """Returns the plain text of a .txt book, or of pages [start, stop) of a PDF."""
+    if file_path.endswith(".txt"):
+        with open(file_path, "r", encoding="utf-8") as f:
+            return f.read()
+
+    reader = PdfReader(file_path)
+    text_content = ""
+    # Merge all pages into one text block
+    for page in reader.pages[start:stop]:
+        extracted = page.extract_text()
+        if extracted:
+            text_content += extracted + "\n"
+    return text_content
+
+
+def extraction_tasks(file_path):
+    """Splits one book into (file_path, start, stop) extraction tasks."""
+    if not file_path.endswith(".pdf"):
+        return [(file_path, 0, None)]
+
+    total = len(PdfReader(file_path).pages)
+    if total <= PAGES_PER_TASK:
+        return [(file_path, 0, None)]
+    return [
+        (file_path, start, min(start + PAGES_PER_TASK, total))
+        for start in range(0, total, PAGES_PER_TASK)
+    ]
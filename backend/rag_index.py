@@ -0,0 +1,226 @@
+import heapq
+import math
+import re
+from collections import Counter
+
+# Paragraph-sized chunks: small paragraphs are merged up to the target,
+# oversized ones are cut at the nearest line / sentence break.
+CHUNK_TARGET_CHARS = 800
+CHUNK_MAX_CHARS = 1500
+
+# Passages: query terms must fall within this many tokens of each other,
+# and the returned snippet is padded out to roughly this many characters.
+WINDOW_TOKENS = 60
+PASSAGE_CHARS = 500
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+# case-insensitive twin for scanning original text without changing offsets
+_TOKEN_RE_I = re.compile(r"[a-z0-9]+", re.IGNORECASE)
+_PARA_BREAK_RE = re.compile(r"\n\s*\n")
+
+STOPWORDS = {
+    "a", "an", "the", "is", "are", "was", "were", "be", "been", "of", "to",
+    "in", "on", "for", "and", "or", "at", "by", "as", "it", "its", "with",
+    "from", "that", "this", "how", "what", "who", "when", "where", "why",
+    "which", "do", "does", "did", "can", "i", "me", "my", "you", "your"
+}
+
+
+def tokenize(text):
+    """Lowercase word tokens with stopwords removed."""
+    return [t for t in _TOKEN_RE.findall(text.lower()) if t not in STOPWORDS]
+
+
+def _paragraph_spans(text, max_chars):
+    pos = 0
+    for brk in _PARA_BREAK_RE.finditer(text):
+        yield from _split_long(text, pos, brk.start(), max_chars)
+        pos = brk.end()
+    yield from _split_long(text, pos, len(text), max_chars)
+
+
+def _split_long(text, start, end, max_chars):
+    # trim surrounding whitespace so spans start/end on real text
+    while start < end and text[start].isspace():
+        start += 1
+    while end > start and text[end - 1].isspace():
+        end -= 1
+
+    while end - start > max_chars:
+        limit = start + max_chars
+        cut = text.rfind("\n", start, limit)
+        if cut <= start:
+            cut = text.rfind(". ", start, limit) + 1
+        if cut <= start:
+            cut = text.rfind(" ", start, limit)
+        if cut <= start:
+            cut = limit
+        yield start, cut
+        start = cut
+        while start < end and text[start].isspace():
+            start += 1
+
+    if end > start:
+        yield start, end
+
+
+def split_chunks(text, target_chars=CHUNK_TARGET_CHARS, max_chars=CHUNK_MAX_CHARS):
+    """Returns (start, end) character spans of paragraph-sized chunks."""
+    spans = []
+    start = end = None
+
+    for p_start, p_end in _paragraph_spans(text, max_chars):
+        if start is None:
+            start, end = p_start, p_end
+        elif p_end - start <= target_chars:
+            end = p_end
+        else:
+            spans.append((start, end))
+            start, end = p_start, p_end
+
+    if start is not None:
+        spans.append((start, end))
+
+    return spans
+
+
+class DocumentSegment:
+    """Chunk spans and term postings for a single book."""
+
+    __slots__ = ("source", "spans", "lengths", "postings")
+
+    def __init__(self, source, text, spans=None):
+        self.source = source
+        self.spans = spans if spans is not None else split_chunks(text)
+        self.lengths = []
+        # term -> [(chunk_index, term_frequency), ...]
+        self.postings = {}
+
+        for chunk_index, (start, end) in enumerate(self.spans):
+            counts = Counter(tokenize(text[start:end]))
+            self.lengths.append(sum(counts.values()))
+            for term, tf in counts.items():
+                self.postings.setdefault(term, []).append((chunk_index, tf))
+
+
+class BM25Index:
+    """
+    Inverted index over the chunks of every DocumentSegment.
+    A query only walks the postings of its own terms, so its cost does not
+    grow with the size of the books.
+    """
+
+    def __init__(self, segments, k1=1.5, b=0.75):
+        self.segments = list(segments)
+        self.k1 = k1
+        self.b = b
+
+        self.df = Counter()
+        # term -> indexes of the segments that contain it
+        self.term_segments = {}
+        total_length = 0
+        chunk_count = 0
+
+        for seg_index, seg in enumerate(self.segments):
+            for term, plist in seg.postings.items():
+                self.df[term] += len(plist)
+                self.term_segments.setdefault(term, []).append(seg_index)
+            total_length += sum(seg.lengths)
+            chunk_count += len(seg.lengths)
+
+        self.chunk_count = chunk_count
+        self.avgdl = total_length / chunk_count if chunk_count else 0.0
+
+    def idf(self, term):
+        df = self.df.get(term, 0)
+        return math.log(1 + (self.chunk_count - df + 0.5) / (df + 0.5))
+
+    def search(self, query, top_k=3):
+        """Returns [(segment_index, chunk_index, score), ...] best first."""
+        if not self.chunk_count:
+            return []
+
+        k1, b, avgdl = self.k1, self.b, self.avgdl
+        scores = {}
+
+        for term in set(tokenize(query)):
+            seg_ids = self.term_segments.get(term)
+            if not seg_ids:
+                continue
+            idf = self.idf(term)
+
+            for seg_index in seg_ids:
+                seg = self.segments[seg_index]
+                lengths = seg.lengths
+                for chunk_index, tf in seg.postings[term]:
+                    norm = k1 * (1 - b + b * lengths[chunk_index] / avgdl)
+                    key = (seg_index, chunk_index)
+                    scores[key] = scores.get(key, 0.0) + idf * tf * (k1 + 1) / (tf + norm)
+
+        best = heapq.nlargest(top_k, scores.items(), key=lambda item: item[1])
+        return [(seg_index, chunk_index, score) for (seg_index, chunk_index), score in best]
+
+
+def best_window(text, weights, max_tokens=WINDOW_TOKENS):
+    """
+    Finds the tightest run of at most `max_tokens` tokens covering the most
+    query-term weight. `weights` maps query term -> idf. Returns
+    (score, start, end) character offsets, or None if no term occurs.
+    score = covered weight / total weight * (1 + proximity), where proximity
+    rewards distinct terms packed into a short span.
+    """
+    hits = []  # (token ordinal, start, end, term)
+    for ordinal, match in enumerate(_TOKEN_RE_I.finditer(text)):
+        term = match.group().lower()
+        if term in weights:
+            hits.append((ordinal, match.start(), match.end(), term))
+
+    if not hits:
+        return None
+
+    total = sum(weights.values()) or 1.0
+    counts = {}
+    covered = 0.0
+    distinct = 0
+    left = 0
+    best = None
+
+    for ordinal, _, end, term in hits:
+        if not counts.get(term):
+            covered += weights[term]
+            distinct += 1
+        counts[term] = counts.get(term, 0) + 1
+
+        # drop hits that fall out of the window, then duplicates at the left edge
+        while ordinal - hits[left][0] >= max_tokens or counts[hits[left][3]] > 1:
+            left_term = hits[left][3]
+            counts[left_term] -= 1
+            if not counts[left_term]:
+                covered -= weights[left_term]
+                distinct -= 1
+            left += 1
+
+        span = ordinal - hits[left][0] + 1
+        score = covered / total * (1 + (distinct - 1) / span)
+        if best is None or score > best[0]:
+            best = (score, hits[left][1], end)
+
+    return best
+
+
+def expand_window(text, start, end, size=PASSAGE_CHARS):
+    """Pads [start, end) out to about `size` characters, snapped to word boundaries."""
+    pad = max(0, (size - (end - start)) // 2)
+    new_start = max(0, start - pad)
+    new_end = min(len(text), end + pad)
+
+    if new_start > 0:
+        space = text.find(" ", new_start, start)
+        if space != -1:
+            new_start = space + 1
+    if new_end < len(text):
+        space = text.rfind(" ", end, new_end)
+        if space != -1:
+            new_end = space
+
+    return new_start, new_end
@@ -0,0 +1,166 @@
+import json
+import os
+import time
+
+from rag_cache import library_fingerprint
+
+# Optional: pip install sentence-transformers faiss-cpu
+# Imported by the first VectorIndex, so bm25-only servers and extraction
+# workers never pay for loading torch.
+faiss = None
+np = None
+SentenceTransformer = None
+
+DEFAULT_EMBED_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+
+
+def _import_backend():
+    global faiss, np, SentenceTransformer
+    if SentenceTransformer is not None:
+        return
+    try:
+        import faiss as faiss_module
+        import numpy as numpy_module
+        from sentence_transformers import SentenceTransformer as model_class
+    except ImportError:
+        raise ImportError("Dense retrieval needs: pip install sentence-transformers faiss-cpu") from None
+    faiss, np, SentenceTransformer = faiss_module, numpy_module, model_class
+
+
+class VectorIndex:
+    """
+    Dense retrieval over the library chunks: a local CPU sentence-transformers
+    model embeds the chunks in batches into a FAISS HNSW index, which is
+    persisted to knowledge_base/.cache and reused while the library is unchanged.
+    """
+
+    def __init__(self, cache_dir, model_name=None, batch_size=64):
+        _import_backend()
+
+        self.cache_dir = cache_dir
+        self.model_name = model_name or os.getenv("RAG_EMBED_MODEL", DEFAULT_EMBED_MODEL)
+        self.batch_size = batch_size
+        self.index_path = os.path.join(cache_dir, "vectors.faiss")
+        self.meta_path = os.path.join(cache_dir, "vectors.json")
+
+        self.model = None
+        self.index = None
+        # FAISS row -> (source, chunk_index)
+        self.keys = []
+        self.stats = {"vectors": 0, "embedded": 0, "build_ms": None, "loaded_from_disk": False}
+
+    def _encoder(self):
+        if self.model is None:
+            # model files are downloaded once and kept next to the knowledge base
+            self.model = SentenceTransformer(
+                self.model_name, device="cpu",
+                cache_folder=os.path.join(self.cache_dir, "models")
+            )
+        return self.model
+
+    def _embed(self, texts):
+        vectors = self._encoder().encode(
+            texts, batch_size=self.batch_size, convert_to_numpy=True,
+            normalize_embeddings=True, show_progress_bar=False
+        )
+        return np.asarray(vectors, dtype="float32")
+
+    def _load_persisted(self, fingerprint):
+        try:
+            with open(self.meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return False
+
+        if meta.get("fingerprint") != fingerprint or not os.path.exists(self.index_path):
+            return False
+
+        self.index = faiss.read_index(self.index_path)
+        self.keys = [tuple(key) for key in meta["keys"]]
+        return True
+
+    def _persist(self, fingerprint):
+        """Writes the index next to the text cache; a failed write keeps serving from memory."""
+        tmp_index = f"{self.index_path}.{os.getpid()}.tmp"
+        tmp_meta = f"{self.meta_path}.{os.getpid()}.tmp"
+        stale = [tmp_index, tmp_meta]
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            faiss.write_index(self.index, tmp_index)
+            os.replace(tmp_index, self.index_path)
+            # the old vectors.json no longer describes vectors.faiss
+            stale.append(self.meta_path)
+
+            with open(tmp_meta, "w", encoding="utf-8") as f:
+                json.dump({"fingerprint": fingerprint, "model": self.model_name, "keys": self.keys}, f)
+            os.replace(tmp_meta, self.meta_path)
+            return True
+        except (OSError, RuntimeError) as e:
+            # faiss reports its own I/O failures as RuntimeError
+            print(f"[RAG] ⚠️ Could not persist vector index, keeping it in memory: {e}")
+            for path in stale:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            return False
+
+    def build(self, books, previous=None, changed=()):
+        """
+        books: [(source, text, spans), ...]. Loads the persisted index when
+        the library and model are unchanged. Otherwise embeds the chunks,
+        reusing the vectors of `previous` for books not listed in `changed`.
+        """
+        started = time.perf_counter()
+        fingerprint = library_fingerprint(self.model_name, books)
+
+        if self._load_persisted(fingerprint):
+            self.stats["loaded_from_disk"] = True
+        else:
+            reusable = {}
+            if previous is not None and previous.model_name == self.model_name and previous.index is not None:
+                self.model = previous.model
+                reusable = {key: row for row, key in enumerate(previous.keys) if key[0] not in changed}
+
+            self.keys = []
+            texts = []
+            new_rows = []
+            for source, text, spans in books:
+                for chunk_index, (start, end) in enumerate(spans):
+                    if (source, chunk_index) not in reusable:
+                        new_rows.append(len(self.keys))
+                        texts.append(text[start:end])
+                    self.keys.append((source, chunk_index))
+
+            dim = self._encoder().get_sentence_embedding_dimension()
+            matrix = np.zeros((len(self.keys), dim), dtype="float32")
+            for row, key in enumerate(self.keys):
+                if key in reusable:
+                    matrix[row] = previous.index.reconstruct(reusable[key])
+            if texts:
+                matrix[new_rows] = self._embed(texts)
+
+            # HNSW graph: approximate search, inner product == cosine on normalised vectors
+            self.index = faiss.IndexHNSWFlat(dim, 32, faiss.METRIC_INNER_PRODUCT)
+            if len(self.keys):
+                self.index.add(matrix)
+            self._persist(fingerprint)
+            self.stats["loaded_from_disk"] = False
+            self.stats["embedded"] = len(texts)
+
+        self.index.hnsw.efSearch = 64
+        self.stats["vectors"] = self.index.ntotal
+        self.stats["build_ms"] = round((time.perf_counter() - started) * 1000)
+        return self
+
+    def search(self, query, top_k=3):
+        """Returns [((source, chunk_index), cosine_score), ...] best first."""
+        if self.index is None or not self.index.ntotal:
+            return []
+
+        scores, rows = self.index.search(self._embed([query]), top_k)
+        return [
+            (self.keys[row], float(score))
+            for row, score in zip(rows[0], scores[0])
+            if row != -1
+        ]
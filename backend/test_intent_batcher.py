@@ -0,0 +1,106 @@
+import json
+import threading
+import time
+
+from agent.intent_batcher import IntentBatcher
+
+
+class StubResponse:
+    def __init__(self, text):
+        self.text = text
+
+
+class StubModel:
+    """Answers like Gemini would: one {"intent", "subject"} object per query."""
+
+    def __init__(self, batch_reply=None, fail=False):
+        # batch_reply(queries) -> raw text, to simulate a mangled batch answer
+        self.batch_reply = batch_reply
+        self.fail = fail
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def generate_content(self, prompt):
+        if "User Queries: " in prompt:
+            queries = json.loads(prompt.split("User Queries: ", 1)[1])
+        else:
+            queries = [prompt.split("User Query: ", 1)[1]]
+        with self._lock:
+            self.calls.append(queries)
+        if self.fail:
+            raise TimeoutError("stub model unavailable")
+        if len(queries) > 1 and self.batch_reply:
+            return StubResponse(self.batch_reply(queries))
+        results = [{"intent": "SHOT", "subject": query} for query in queries]
+        return StubResponse(json.dumps(results if len(queries) > 1 else results[0]))
+
+
+def classify_all(batcher, messages):
+    futures = [batcher.submit(message) for message in messages]
+    return [future.result(timeout=5) for future in futures]
+
+
+def test_groups_by_max_batch_and_routes_results():
+    model = StubModel()
+    batcher = IntentBatcher(model, "PROMPT", window_ms=200, max_batch=8)
+    messages = [f"question {i}" for i in range(10)]
+
+    results = classify_all(batcher, messages)
+
+    assert [r["subject"] for r in results] == messages
+    assert sorted(len(call) for call in model.calls) == [2, 8]
+    assert batcher.stats()["largest_batch"] == 8
+
+
+def test_window_closes_a_batch():
+    model = StubModel()
+    batcher = IntentBatcher(model, "PROMPT", window_ms=20, max_batch=8)
+
+    first = batcher.classify("pull shot")
+    time.sleep(0.1)
+    second = batcher.classify("cover drive")
+
+    assert (first["subject"], second["subject"]) == ("pull shot", "cover drive")
+    assert model.calls == [["pull shot"], ["cover drive"]]
+
+
+def test_wrong_length_batch_falls_back_to_single_calls():
+    model = StubModel(batch_reply=lambda queries: json.dumps([{"intent": "SHOT", "subject": queries[0]}]))
+    batcher = IntentBatcher(model, "PROMPT", window_ms=200, max_batch=3)
+    messages = ["sweep", "hook", "cut"]
+
+    results = classify_all(batcher, messages)
+
+    assert [r["subject"] for r in results] == messages
+    assert len(model.calls) == 4
+    assert sorted(call[0] for call in model.calls if len(call) == 1) == sorted(messages)
+    assert batcher.stats()["split_batches"] == 1
+
+
+def test_invalid_json_batch_falls_back_to_single_calls():
+    model = StubModel(batch_reply=lambda queries: "Sorry, here are your intents:")
+    batcher = IntentBatcher(model, "PROMPT", window_ms=200, max_batch=2)
+
+    results = classify_all(batcher, ["yorker", "bouncer"])
+
+    assert [r["subject"] for r in results] == ["yorker", "bouncer"]
+    assert batcher.stats()["split_batches"] == 1
+
+
+def test_model_failure_reaches_every_caller():
+    model = StubModel(fail=True)
+    batcher = IntentBatcher(model, "PROMPT", window_ms=200, max_batch=2)
+    futures = [batcher.submit("drive"), batcher.submit("flick")]
+
+    for future in futures:
+        assert isinstance(future.exception(timeout=5), TimeoutError)
+    # not retried one by one: the model itself is failing
+    assert len(model.calls) == 1
+    assert batcher.stats()["failed_batches"] == 1
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_"):
+            test()
+            print(f"ok  {name}")
@@ -0,0 +1,106 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from agent.llm_client import CircuitBreaker, LLMClient, LLMUnavailable
+
+
+class StubResponse:
+    def __init__(self, text):
+        self.text = text
+
+
+class SlowModel:
+    """Healthy provider that takes `seconds` per call; streams yield one chunk per `seconds`."""
+
+    def __init__(self, seconds, chunks=3):
+        self.seconds = seconds
+        self.chunks = chunks
+        self.calls = 0
+        self.closed = threading.Event()
+        self._lock = threading.Lock()
+
+    def generate_content(self, prompt, stream=False):
+        with self._lock:
+            self.calls += 1
+        if stream:
+            return self._stream()
+        time.sleep(self.seconds)
+        return StubResponse("ok")
+
+    def _stream(self):
+        try:
+            for i in range(self.chunks):
+                time.sleep(self.seconds)
+                yield StubResponse(str(i))
+        finally:
+            self.closed.set()
+
+
+def call_all(client, callers):
+    def call(_):
+        try:
+            return client.generate_content("prompt").text
+        except LLMUnavailable:
+            return None
+
+    with ThreadPoolExecutor(max_workers=callers) as pool:
+        return list(pool.map(call, range(callers)))
+
+
+def test_queued_attempts_are_cancelled_and_do_not_trip_the_breaker():
+    model = SlowModel(0.5)
+    client = LLMClient(model, deadline=0.2, max_attempts=1, pool_size=1,
+                       breaker=CircuitBreaker(failure_threshold=2))
+
+    results = call_all(client, 3)
+    time.sleep(0.6)
+
+    assert results == [None, None, None]
+    # only the attempt that got the worker reached the provider
+    assert model.calls == 1
+    assert client.counts["timeouts"] == 1
+    assert client.counts["queued_timeouts"] == 2
+    assert client.breaker.state == "closed"
+
+
+def test_pool_sized_for_the_burst_serves_every_caller():
+    model = SlowModel(0.1)
+    client = LLMClient(model, deadline=0.5, max_attempts=1, pool_size=8)
+
+    assert call_all(client, 8) == ["ok"] * 8
+    assert client.stats()["pool_size"] == 8
+
+
+def test_stream_producer_stops_when_the_reader_goes_away():
+    model = SlowModel(0.05, chunks=100)
+    client = LLMClient(model, deadline=5, pool_size=1)
+
+    stream = client.generate_content("prompt", stream=True)
+    assert next(stream).text == "0"
+    stream.close()
+
+    assert model.closed.wait(1)
+    assert client.breaker.state == "closed"
+
+
+def test_stream_producer_stops_after_a_timeout():
+    model = SlowModel(0.05, chunks=100)
+    client = LLMClient(model, deadline=0.2, pool_size=1)
+
+    try:
+        list(client.generate_content("prompt", stream=True))
+    except LLMUnavailable:
+        pass
+    else:
+        raise AssertionError("expected LLMUnavailable")
+
+    assert model.closed.wait(1)
+    assert client.counts["timeouts"] == 1
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_"):
+            test()
+            print(f"ok  {name}")
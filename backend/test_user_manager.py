@@ -0,0 +1,78 @@
+import os
+import tempfile
+
+from agent.user_manager import UserManager
+
+PLAYER = {
+    "name": "Asha", "age": 15, "height_cm": 165, "weight_kg": 55,
+    "skill_level": "intermediate", "playing_role": "middle order batsman"
+}
+
+
+def make_manager(folder):
+    return UserManager(
+        db_path=os.path.join(folder, "users.sqlite3"),
+        profile_path=os.path.join(folder, "no_profiles.json"),
+        checkpoint_seconds=0
+    )
+
+
+def test_get_profile_is_fresh_after_update():
+    with tempfile.TemporaryDirectory() as folder:
+        manager = make_manager(folder)
+        _, user_id = manager.register_user(PLAYER)
+        before = manager.get_profile(user_id)
+        assert manager.get_profile(user_id) is before
+
+        ok, record = manager.update_user(user_id, {"age": 17, "skill_level": "advanced"})
+
+        assert ok and record["age_group"] == "U19"
+        after = manager.get_profile(user_id)
+        assert after is not before
+        assert (after.age, after.skill_level, after.age_group) == (17, "advanced", "U19")
+        assert after.name == "Asha"
+
+
+def test_update_from_another_worker_invalidates_the_cache():
+    with tempfile.TemporaryDirectory() as folder:
+        manager = make_manager(folder)
+        _, user_id = manager.register_user(PLAYER)
+        assert manager.get_profile(user_id).weight_kg == 55
+
+        # a second process sharing the database: only the version column tells the first
+        make_manager(folder).update_user(user_id, {"weight_kg": 60})
+
+        assert manager.get_profile(user_id).weight_kg == 60
+
+
+def test_update_rejects_invalid_changes():
+    with tempfile.TemporaryDirectory() as folder:
+        manager = make_manager(folder)
+        _, user_id = manager.register_user(PLAYER)
+
+        ok, _ = manager.update_user(user_id, {"age": 3})
+        assert not ok
+        assert manager.get_profile(user_id).age == 15
+        assert manager.update_user("USER9999", {"age": 16}) == (False, "User not found")
+
+
+def test_export_resumes_after_a_cursor_and_rejects_unknown_ones():
+    with tempfile.TemporaryDirectory() as folder:
+        manager = make_manager(folder)
+        ids = [manager.register_user(PLAYER)[1] for _ in range(5)]
+
+        resumed = [r["user_id"] for r in manager.iter_users(page_size=2, after=ids[1])]
+        assert resumed == ids[2:]
+        try:
+            manager.iter_users(after="USER9999")
+        except KeyError:
+            pass
+        else:
+            raise AssertionError("expected KeyError for an unknown cursor")
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_"):
+            test()
+            print(f"ok  {name}")